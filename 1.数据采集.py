@@ -1,32 +1,48 @@
 """
 数据来源网址
 http://www.tianqihoubao.com/aqi/changsha-2025xx.html (xx代表月份)
+
+设置环境变量 AQI_SOURCE=station 时改为读取 station_dumps/ 目录下的
+本地逐小时站点导出文件（CSV/JSON），按城市存储为 空气质量-{城市}_hour.csv
 """
 
 
+import os
 import pandas as pd
 import requests
 import warnings
+from instrumentation import count, span
+from timeseries_features import load_station_dumps
 
 warnings.filterwarnings("ignore")
-for page in range(1, 13):
-    if page < 10:
-        url = f'http://www.tianqihoubao.com/aqi/changsha-20240{page}.html'
-        res = requests.get(url)
-        html = res.text
-        df = pd.read_html(html, encoding='utf-8')[0]
-        if page == 1:
-            df.to_csv('空气质量-changsha_day.csv', mode='a+', index=False, header=False)
-        else:
-            df.iloc[1:, ::].to_csv('空气质量-changsha_day.csv', mode='a+', index=False, header=False)
-        print(f"{page}月数据采集完毕")
-    else:
-        url = f'http://www.tianqihoubao.com/aqi/changsha-2024{page}.html'
-        res = requests.get(url)
-        html = res.text
-        df = pd.read_html(html, encoding='utf-8')[0]
-        df.iloc[1:, ::].to_csv('空气质量-changsha_day.csv', mode='a+', index=False, header=False)
-        print(f"{page}月数据采集完毕")
 
-print("长沙2024空气质量数据采集完毕！\n存储文件:空气质量-changsha_day.csv")
+# 需要采集的城市（网址中的城市拼音），每个城市单独存储为 空气质量-{城市}_day.csv
+CITIES = ['changsha']
+YEAR = 2024
+SOURCE = os.environ.get('AQI_SOURCE', 'web')
 
+if SOURCE == 'station':
+    with span('读取站点数据'):
+        hourly = load_station_dumps('station_dumps')
+    for city, city_data in hourly.groupby('城市', observed=True):
+        save_path = f'空气质量-{city}_hour.csv'
+        city_data.to_csv(save_path, index=False)
+        print(f"{city} 逐小时数据导入完毕，共 {len(city_data)} 条\n存储文件:{save_path}")
+else:
+    for city in CITIES:
+        save_path = f'空气质量-{city}_day.csv'
+        for page in range(1, 13):
+            url = f'http://www.tianqihoubao.com/aqi/{city}-{YEAR}{page:02d}.html'
+            with span('请求网页', 城市=city, 月份=page):
+                res = requests.get(url)
+                html = res.text
+            with span('解析网页', 城市=city, 月份=page):
+                df = pd.read_html(html, encoding='utf-8')[0]
+            count('采集页数')
+            # 第1页（含表头行）覆盖写入，重复采集不会追加重复数据
+            if page == 1:
+                df.to_csv(save_path, mode='w', index=False, header=False)
+            else:
+                df.iloc[1:, ::].to_csv(save_path, mode='a+', index=False, header=False)
+            print(f"{city} {page}月数据采集完毕")
+        print(f"{city} {YEAR}空气质量数据采集完毕！\n存储文件:{save_path}")
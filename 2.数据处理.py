@@ -1,20 +1,59 @@
+import glob
+import re
 import pandas as pd
-file_path = '空气质量-changsha_day.csv'
-data = pd.read_csv(file_path)
+from data_loader import memory_snapshot
+from data_quality import STATISTICS_PATH, city_statistics, save_statistics, screen
+from instrumentation import memory, span
+from timeseries_features import (RESOLUTION, POLLUTANTS, build_lag_features, downcast,
+                                 lag_name, raw_file_pattern, rollup_daily)
+
+# 读取所有城市的原始数据，城市名取自文件名 空气质量-{城市}_{分辨率}.csv
+frames = {}
+for file_path in sorted(glob.glob(raw_file_pattern(RESOLUTION))):
+    city = re.match(rf'空气质量-(.+)_{RESOLUTION}\.csv', file_path).group(1)
+    with span('读取原始数据', 城市=city):
+        city_data = pd.read_csv(file_path)
+    city_data['城市'] = city
+    frames[city] = downcast(city_data)
+# 逐日分辨率下，没有逐日数据的城市由逐小时数据汇总
+if RESOLUTION == 'day':
+    for file_path in sorted(glob.glob(raw_file_pattern('hour'))):
+        city = re.match(r'空气质量-(.+)_hour\.csv', file_path).group(1)
+        if city not in frames:
+            hourly = pd.read_csv(file_path, parse_dates=['日期'])
+            hourly['城市'] = city
+            frames[city] = rollup_daily(downcast(hourly))
+            print(f"{city}: 由 {len(hourly)} 条逐小时数据汇总为 {len(frames[city])} 条逐日数据")
+if not frames:
+    raise FileNotFoundError(f"没有找到原始数据文件 {raw_file_pattern(RESOLUTION)}，请先运行数据采集脚本")
+data = pd.concat(frames.values(), ignore_index=True)
+data['城市'] = data['城市'].astype('category')
 data['日期'] = pd.to_datetime(data['日期'])
 data['年'] = data['日期'].dt.year
 data['月'] = data['日期'].dt.month
 data['日'] = data['日期'].dt.day
 data['星期'] = data['日期'].dt.dayofweek
+if RESOLUTION == 'hour':
+    data['小时'] = data['日期'].dt.hour
 data.drop_duplicates(inplace=True)
-data['AQI_1天前'] = data['AQI指数'].shift(1);data['AQI_2天前'] = data['AQI指数'].shift(2)
-data['PM2.5_1天前'] = data['PM2.5'].shift(1);data['PM2.5_2天前'] = data['PM2.5'].shift(2)
-data['PM10_1天前'] = data['PM10'].shift(1);data['PM10_2天前'] = data['PM10'].shift(2)
-data['So2_1天前'] = data['So2'].shift(1);data['So2_2天前'] = data['So2'].shift(2)
-data['No2_1天前'] = data['No2'].shift(1);data['No2_2天前'] = data['No2'].shift(2)
-data['O3_1天前'] = data['O3'].shift(1);data['O3_2天前'] = data['O3'].shift(2)
-data['Co_1天前'] = data['Co'].shift(1);data['Co_2天前'] = data['Co'].shift(2)
-data = data.dropna()
-data.to_csv("dataset.csv", index=False)
+# 数据质量检查：命中硬性规则的数值置为缺失值，AQI 无效的行隔离到 quarantine.csv，不参与滞后特征计算
+# 按城市的统计量一并保存，监控新观测时使用
+with span('质量检查', 行数=len(data)):
+    quality_stats = city_statistics(data)
+    data, quarantine, quality_report = screen(data, RESOLUTION, quality_stats)
+save_statistics(quality_stats, STATISTICS_PATH)
+quarantine.to_csv('quarantine.csv', index=False)
+quality_report.to_csv('data_quality_report.csv', index=False)
+masked = quality_report.loc[quality_report['类型'] == '屏蔽', '行数'].sum()
+print(f"数据质量检查: 隔离 {len(quarantine)} 行，屏蔽 {masked} 个数值，详见 quarantine.csv 和 data_quality_report.csv")
+# 滞后特征按城市、按时间单位计算，缺失的时刻不会错位
+with span('滞后特征', 行数=len(data)):
+    data = build_lag_features(data, RESOLUTION)
+# 只要求预测目标和上一时间单位的 AQI 存在；被屏蔽的其他数值在训练加载时用中位数填充，
+# 不会因一个单元格连带丢弃之后几行
+data = data.dropna(subset=['AQI指数', lag_name('AQI', 1)])
+with span('写入数据集', 行数=len(data)):
+    data.to_csv("dataset.csv", index=False)
+memory('数据处理完成', *memory_snapshot())
 print("数据处理完毕，存储位置dataset.csv")
-print(data.head(7))
\ No newline at end of file
+print(data.head(7))
@@ -1,50 +1,26 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import seaborn as sns
 import os
+import report_plots
+from analysis_engine import analyze
+from instrumentation import span
+from report_renderer import FigureJob, render_figures
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['SimHei']
-plt.rcParams['axes.unicode_minus'] = False
 # 创建图片保存目录
 if not os.path.exists('analysis_plots'):
     os.makedirs('analysis_plots')
-# 加载数据
+# 分块单次遍历数据：流式相关系数、月度直方图、降采样时间序列
 file_path = 'dataset.csv'
-data = pd.read_csv(file_path)
-data['日期'] = pd.to_datetime(data['日期'])
+with span('流式分析'):
+    result = analyze(file_path)
+print(f"共分析 {result['n_rows']} 条记录")
 # 相关性分析
-numeric_columns = data.select_dtypes(include=[np.number]).columns
-correlation_matrix = data[numeric_columns].corr()
+correlation_matrix = result['correlation']
 print(correlation_matrix['AQI指数'].sort_values(ascending=False))
-# 时间序列图
-plt.figure(figsize=(14, 7))
-plt.plot(data['日期'], data['AQI指数'], label='AQI指数')
-plt.xlabel('日期')
-plt.ylabel('AQI指数')
-plt.title('AQI指数随时间变化')
-plt.legend()
-ax = plt.gca()
-ax.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
-ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-plt.tight_layout()
-plt.savefig('analysis_plots/time_series_aqi.png')  # 保存图片
-plt.close()  # 关闭图形，避免重叠
-# 箱线图
-plt.figure(figsize=(14, 7))
-sns.boxplot(x='月', y='AQI指数', data=data)
-plt.xlabel('月份')
-plt.ylabel('AQI指数')
-plt.title('AQI指数的月度分布')
-plt.savefig('analysis_plots/monthly_boxplot.png')  # 保存图片
-plt.close()
-# 热力图
-plt.figure(figsize=(14, 7))
-sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm')
-plt.title('特征相关性热力图')
-plt.savefig('analysis_plots/correlation_heatmap.png')  # 保存图片
-plt.close()
+# 时间序列图、箱线图、热力图并行渲染，数据未变化的图表跳过
+with span('渲染图表'):
+    render_figures([
+        FigureJob(report_plots.time_series_aqi, result['series'], 'analysis_plots/time_series_aqi.png'),
+        FigureJob(report_plots.monthly_boxplot, result['monthly'].box_stats(), 'analysis_plots/monthly_boxplot.png'),
+        FigureJob(report_plots.correlation_heatmap, correlation_matrix, 'analysis_plots/correlation_heatmap.png'),
+    ])
 
-print("分析完成，图片已保存至 analysis_plots 目录")
\ No newline at end of file
+print("分析完成，图片已保存至 analysis_plots 目录")
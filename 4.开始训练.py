@@ -1,5 +1,5 @@
 import pandas as pd
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split, cross_val_predict, KFold
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.svm import SVR
@@ -8,48 +8,72 @@ from sklearn.metrics import mean_absolute_error, r2_score, mean_squared_error
 import joblib
 import numpy as np
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# 设置 Matplotlib 的字体为支持中文的字体
-plt.rcParams['font.sans-serif'] = ['Microsoft YaHei']  # 使用微软雅黑
-plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+from city_model import GlobalAQIModel, CITY_COLUMN
+from ensemble import BlendedEnsemble
+from intervals import ConformalRegressor
+from explain import global_importance, supports_explanation
+from data_loader import load_training_matrix, log_stage_memory, take_rows, STAGE_MEMORY
+from instrumentation import span
+import report_plots
+from monitoring import build_profile, save_profile, PROFILE_PATH
+from report_renderer import FigureJob, render_figures
+from data_quality import STATISTICS_PATH, load_statistics
+from timeseries_features import RESOLUTION, TIME_COLUMN, feature_columns
 
 # 1. 加载数据
 file_path = 'dataset.csv'
 if not os.path.exists(file_path):
     raise FileNotFoundError(f"数据文件 {file_path} 不存在，请检查路径")
 
-try:
-    data = pd.read_csv(file_path)
-    print(f"成功加载数据，共 {len(data)} 条记录")
-except Exception as e:
-    raise IOError(f"加载数据文件时出错: {str(e)}")
+# 特征为各污染物上一个时间单位的值（由 AQI_RESOLUTION 决定逐日或逐小时）
+features = feature_columns()
 
-# 检查必需的列
-required_columns = {'AQI指数', 'AQI_1天前', 'PM2.5_1天前', 'PM10_1天前',
-                    'So2_1天前', 'No2_1天前', 'O3_1天前', 'Co_1天前'}
-missing_columns = required_columns - set(data.columns)
+# 检查必需的列（只读取表头）
+data_columns = set(pd.read_csv(file_path, nrows=0).columns)
+required_columns = {'AQI指数'} | set(features)
+missing_columns = required_columns - data_columns
 if missing_columns:
     raise ValueError(f"数据中缺少必需的列: {', '.join(missing_columns)}")
 
 # 2. 特征选择
-features = ['AQI_1天前', 'PM2.5_1天前', 'PM10_1天前', 'So2_1天前', 'No2_1天前', 'O3_1天前', 'Co_1天前']
-X = data[features]
-y = data['AQI指数']
-
-# 处理缺失值
-if X.isnull().any().any() or y.isnull().any():
-    print("警告: 数据中存在缺失值，将使用中位数填充")
-    X = X.fillna(X.median())
-    y = y.fillna(y.median())
-
-# 3. 划分数据集
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y,
-    test_size=0.2,
-    random_state=42
-)
+city_column = CITY_COLUMN if CITY_COLUMN in data_columns else None
+
+# 分块读取为 float32 内存映射矩阵，缺失值在加载时用中位数填充
+try:
+    with span('加载数据'):
+        matrix = load_training_matrix(file_path, features, 'AQI指数', city_column=city_column,
+                                      time_column=TIME_COLUMN if TIME_COLUMN in data_columns else None)
+    print(f"成功加载数据，共 {len(matrix.y)} 条记录")
+except Exception as e:
+    raise IOError(f"加载数据文件时出错: {str(e)}")
+
+if any(matrix.missing_counts.values()):
+    print("警告: 数据中存在缺失值，已使用中位数填充")
+
+rows = np.arange(len(matrix.y))
+# 多城市数据时加入城市列，由全局模型做城市编码和校准；城市缺失的行无法归属，直接剔除
+if city_column:
+    unknown = matrix.cities.isna()
+    if unknown.any():
+        print(f"警告: {int(unknown.sum())} 条记录缺少城市，已剔除")
+        rows = rows[~unknown]
+    print(f"共 {len(matrix.cities.categories)} 个城市，训练全局模型")
+log_stage_memory('加载数据')
+
+
+def subset(idx):
+    """按行下标取子集：特征逐块写入 cache 目录下的临时内存映射，不在内存中复制"""
+    X_part = pd.DataFrame(take_rows(matrix.X, idx, cache_dir='cache'), columns=features, copy=False)
+    if city_column:
+        X_part[CITY_COLUMN] = matrix.cities[idx]
+    return X_part, pd.Series(matrix.y[idx], name='AQI指数', copy=False)
+
+
+# 3. 划分数据集（只划分行下标，不复制整张表）
+train_idx, test_idx = train_test_split(rows, test_size=0.2, random_state=42)
+X_train, y_train = subset(train_idx)
+X_test, y_test = subset(test_idx)
+log_stage_memory('划分数据集')
 
 print(f"训练集大小: {len(X_train)} 条记录")
 print(f"测试集大小: {len(X_test)} 条记录")
@@ -78,16 +102,24 @@ models = {
     }
 }
 
+# 集成模型：用折外预测学习以上基础模型的非负融合权重，权重为0的模型被剪除
+models['集成模型'] = {
+    'model': BlendedEnsemble([(name, config['model']) for name, config in models.items()]),
+    'desc': "基于折外预测学习非负权重的基础模型加权集成"
+}
+
 # 创建目录保存模型和评估结果
 os.makedirs('models', exist_ok=True)
 os.makedirs('evaluation', exist_ok=True)
 
 # 5. 训练并评估模型
 results = []
-eval_dfs = []
+eval_dfs = {}
+importances = {}
 
 for name, config in models.items():
-    model = config['model']
+    # 所有城市共用一个模型文件
+    model = GlobalAQIModel(config['model'], cache_dir='cache')
     description = config['desc']
 
     print(f"\n{'=' * 60}")
@@ -96,35 +128,65 @@ for name, config in models.items():
 
     try:
         # 训练模型
-        model.fit(X_train, y_train)
+        with span('训练', 模型=name, 行数=len(X_train)):
+            model.fit(X_train, y_train)
+
+        log_stage_memory(f'{name} 训练')
+
+        # 交叉验证（折外预测同时用于共形区间校准）
+        cv_folds = KFold(n_splits=5)
+        with span('交叉验证', 模型=name):
+            oof_pred = cross_val_predict(model, X_train, y_train, cv=cv_folds)
+        y_train_values = np.asarray(y_train)
+        cv_rmse = np.array([
+            np.sqrt(mean_squared_error(y_train_values[test_idx], oof_pred[test_idx]))
+            for _, test_idx in cv_folds.split(X_train)
+        ])
 
-        # 保存模型
+        log_stage_memory(f'{name} 交叉验证')
+
+        # 保存模型（附带90%预测区间校准表）
+        model = ConformalRegressor.from_prefit(model, y_train, oof_pred, alpha=0.1)
         model_path = os.path.join('models', f'{name}_model.pkl')
         joblib.dump(model, model_path)
         print(f"✅ 模型已保存至 {model_path}")
 
-        # 交叉验证
-        cv_scores = cross_val_score(model, X_train, y_train,
-                                    cv=5, scoring='neg_mean_squared_error')
-        cv_rmse = np.sqrt(-cv_scores)
+        # 输出集成权重
+        if isinstance(model.estimator_.estimator_, BlendedEnsemble):
+            weights = model.estimator_.estimator_.blend_weights()
+            print("集成权重: " + ", ".join(f"{n}={w:.3f}" for n, w in weights.items()))
+            weights_path = os.path.join('evaluation', 'ensemble_weights.csv')
+            pd.DataFrame({'模型': list(weights), '权重': list(weights.values())}).to_csv(weights_path, index=False)
 
         # 在测试集上评估
-        y_pred = model.predict(X_test)
+        with span('预测', 模型=name, 行数=len(X_test)):
+            y_pred, y_lower, y_upper = model.predict_interval(X_test)
 
         mae = mean_absolute_error(y_test, y_pred)
         rmse = np.sqrt(mean_squared_error(y_test, y_pred))
         r2 = r2_score(y_test, y_pred)
         accuracy = (abs(y_pred - y_test) <= 30).mean()
+        coverage = ((y_test >= y_lower) & (y_test <= y_upper)).mean()
+        interval_width = (y_upper - y_lower).mean()
 
         # 保存评估结果
         eval_df = pd.DataFrame({
             '真实值': y_test,
             '预测值': y_pred,
-            '误差': y_pred - y_test
+            '误差': y_pred - y_test,
+            '下限': y_lower,
+            '上限': y_upper
         })
         eval_path = os.path.join('evaluation', f'{name}_predictions.csv')
         eval_df.to_csv(eval_path, index=False)
+        eval_dfs[name] = eval_df
         print(f"📊 预测结果已保存至 {eval_path}")
+        log_stage_memory(f'{name} 评估')
+
+        # 全局特征重要性（测试集平均绝对贡献）
+        if supports_explanation(model):
+            with span('特征重要性', 模型=name):
+                importances[name] = global_importance(model, X_test)
 
         # 收集性能指标
         model_results = {
@@ -135,7 +197,9 @@ for name, config in models.items():
             'R2': r2,
             '准确率(±30)': accuracy,
             '交叉验证RMSE均值': cv_rmse.mean(),
-            '交叉验证RMSE标准差': cv_rmse.std()
+            '交叉验证RMSE标准差': cv_rmse.std(),
+            '90%区间覆盖率': coverage,
+            '平均区间宽度': interval_width
         }
         results.append(model_results)
 
@@ -146,6 +210,7 @@ for name, config in models.items():
         print(f"- R²: {r2:.4f}")
         print(f"- 准确率(误差≤30): {accuracy:.2%}")
         print(f"- 交叉验证RMSE: {cv_rmse.mean():.2f} ± {cv_rmse.std():.2f}")
+        print(f"- 90%预测区间覆盖率: {coverage:.2%} (平均宽度 {interval_width:.1f})")
 
     except Exception as e:
         print(f"❌ 训练模型 {name} 时出错: {str(e)}")
@@ -158,6 +223,8 @@ for name, config in models.items():
             '准确率(±30)': None,
             '交叉验证RMSE均值': None,
             '交叉验证RMSE标准差': None,
+            '90%区间覆盖率': None,
+            '平均区间宽度': None,
             '错误': str(e)
         })
 
@@ -172,128 +239,43 @@ results_path = os.path.join('evaluation', 'model_performance_summary.csv')
 results_df.to_csv(results_path, index=False)
 print(f"\n📈 详细评估结果已保存至 {results_path}")
 
-
-# 7. 可视化结果 - 修复错误并优化
-# 7.1 性能指标比较
-def plot_metrics_comparison():
-    """绘制性能指标比较图"""
-    plt.figure(figsize=(14, 10))
-
-    # 创建子图
-    metrics = ['MAE', 'RMSE', 'R2', '准确率(±30)']
-    titles = ['平均绝对误差(MAE)', '均方根误差(RMSE)', '决定系数(R²)', '准确率(误差≤30)']
-
-    for i, metric in enumerate(metrics):
-        ax = plt.subplot(2, 2, i + 1)
-        # 使用条形图而不是barplot
-        x = range(len(results_df))
-        values = results_df[metric]
-
-        # 跳过无效值
-        valid_mask = values.notna()
-        valid_df = results_df[valid_mask]
-        valid_values = valid_df[metric]
-
-        if len(valid_values) > 0:
-            bars = ax.bar(x, values, color=plt.cm.tab10.colors[:len(values)])
-
-            # 添加数值标签
-            for bar in bars:
-                height = bar.get_height()
-                if not pd.isna(height):
-                    ax.text(bar.get_x() + bar.get_width() / 2., height,
-                            f'{height:.2f}' if metric != 'R2' else f'{height:.4f}',
-                            ha='center', va='bottom')
-
-            # 设置x轴标签
-            ax.set_xticks(x)
-            ax.set_xticklabels(results_df['模型'], rotation=45)
-            ax.set_title(titles[i])
-            ax.grid(True, linestyle='--', alpha=0.7)
-
-    plt.tight_layout()
-    plt.savefig(os.path.join('evaluation', 'performance_metrics.png'))
-    plt.close()
-    print("✅ 性能指标比较图已保存")
-
-
-# 7.2 交叉验证结果比较 - 修复错误
-def plot_cv_comparison():
-    """绘制交叉验证结果比较图"""
-    plt.figure(figsize=(10, 6))
-
-    # 筛选有效数据
-    valid_mask = results_df['交叉验证RMSE均值'].notna() & results_df['交叉验证RMSE标准差'].notna()
-    valid_df = results_df[valid_mask]
-
-    if len(valid_df) > 0:
-        x = range(len(valid_df))
-        means = valid_df['交叉验证RMSE均值']
-        stds = valid_df['交叉验证RMSE标准差']
-
-        # 使用条形图而不是barplot
-        bars = plt.bar(x, means, yerr=stds, capsize=5, color=plt.cm.tab10.colors[:len(means)])
-
-        # 添加数值标签
-        for bar, mean, std in zip(bars, means, stds):
-            plt.text(bar.get_x() + bar.get_width() / 2., mean + std + 0.5,
-                     f'{mean:.2f}±{std:.2f}', ha='center', va='bottom')
-
-        plt.xticks(x, valid_df['模型'], rotation=45)
-        plt.title('交叉验证RMSE比较（均值和标准差）')
-        plt.ylabel('RMSE')
-        plt.grid(True, linestyle='--', alpha=0.7)
-
-        plt.tight_layout()
-        plt.savefig(os.path.join('evaluation', 'cross_validation.png'))
-        plt.close()
-        print("✅ 交叉验证结果比较图已保存")
-    else:
-        print("⚠️ 无有效的交叉验证数据可绘制图表")
-
-
-# 7.3 误差分布可视化
-def plot_error_distributions():
-    """绘制误差分布图"""
-    plt.figure(figsize=(14, 10))
-
-    for i, name in enumerate(models.keys()):
-        ax = plt.subplot(2, 3, i + 1)
-
-        eval_path = os.path.join('evaluation', f'{name}_predictions.csv')
-        if os.path.exists(eval_path):
-            try:
-                eval_df = pd.read_csv(eval_path)
-                errors = eval_df['误差'].dropna()
-
-                if len(errors) > 0:
-                    # 绘制直方图和KDE曲线
-                    sns.histplot(errors, bins=30, kde=True, color=plt.cm.tab10(i))
-
-                    # 添加统计信息
-                    mean_err = errors.mean()
-                    std_err = errors.std()
-                    ax.axvline(mean_err, color='r', linestyle='--')
-                    ax.text(0.95, 0.95, f'均值: {mean_err:.2f}\n标准差: {std_err:.2f}',
-                            transform=ax.transAxes, ha='right', va='top',
-                            bbox=dict(facecolor='white', alpha=0.8))
-
-                    ax.set_title(f'{name}模型预测误差分布')
-                    ax.set_xlabel('误差（预测值 - 真实值）')
-                    ax.set_ylabel('频率')
-                    ax.grid(True, linestyle='--', alpha=0.5)
-            except Exception as e:
-                print(f"❌ 无法加载 {name} 的预测结果: {str(e)}")
-
-    plt.tight_layout()
-    plt.savefig(os.path.join('evaluation', 'error_distributions.png'))
-    plt.close()
-    print("✅ 误差分布图已保存")
-
-
-# 执行可视化函数
-plot_metrics_comparison()
-plot_cv_comparison()
-plot_error_distributions()
-
-print("\n训练和评估过程完成！")
\ No newline at end of file
+# 保存各阶段内存占用
+memory_path = os.path.join('evaluation', 'memory_report.csv')
+pd.DataFrame(STAGE_MEMORY).to_csv(memory_path, index=False)
+print(f"📈 各阶段内存占用已保存至 {memory_path}")
+
+# 保存特征重要性
+importance_df = pd.DataFrame(importances)
+if not importance_df.empty:
+    importance_path = os.path.join('evaluation', 'feature_importance.csv')
+    importance_df.to_csv(importance_path, index_label='特征')
+    print(f"📈 特征重要性已保存至 {importance_path}")
+
+# 保存训练数据画像（特征分布、各城市数据截止时间、测试集RMSE、数据质量统计量），供 6.模型监控.py 检测漂移
+# 各城市数据截止时间在加载训练矩阵时已一并得到，不再读取数据文件
+quality_stats = load_statistics(STATISTICS_PATH) if os.path.exists(STATISTICS_PATH) else None
+profile = build_profile(X_train, features, matrix.max_times, results_df.set_index('模型')['RMSE'], RESOLUTION,
+                        quality_stats)
+save_profile(profile)
+print(f"📈 训练数据画像已保存至 {PROFILE_PATH}")
+
+# 7. 可视化结果 - 使用内存中的评估结果并行渲染，数据未变化的图表跳过
+figure_jobs = [
+    FigureJob(report_plots.metrics_comparison, results_df, os.path.join('evaluation', 'performance_metrics.png')),
+    FigureJob(report_plots.error_distributions, {name: df['误差'] for name, df in eval_dfs.items()},
+              os.path.join('evaluation', 'error_distributions.png')),
+]
+if (results_df['交叉验证RMSE均值'].notna() & results_df['交叉验证RMSE标准差'].notna()).any():
+    figure_jobs.append(FigureJob(report_plots.cv_comparison, results_df,
+                                 os.path.join('evaluation', 'cross_validation.png')))
+else:
+    print("⚠️ 无有效的交叉验证数据可绘制图表")
+if not importance_df.empty:
+    figure_jobs.append(FigureJob(report_plots.feature_importance, importance_df,
+                                 os.path.join('evaluation', 'feature_importance.png')))
+else:
+    print("⚠️ 没有支持解释的模型，跳过特征重要性图")
+with span('渲染图表'):
+    render_figures(figure_jobs)
+
+print("\n训练和评估过程完成！")
@@ -1,94 +1,635 @@
 # 5.预测.py
-import pandas as pd
-import joblib
 import sys
 import os
+import time
 import warnings
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QComboBox, QPushButton, QTextEdit, QGridLayout,
-    QGroupBox, QStatusBar, QMessageBox
+    QGroupBox, QStatusBar, QMessageBox, QProgressBar, QTabWidget, QCheckBox
 )
-from PySide6.QtGui import QFont, QIcon, QPalette, QColor, QDoubleValidator
-from PySide6.QtCore import Qt, QLocale
+from PySide6.QtGui import QFont, QIcon, QPalette, QColor, QDoubleValidator, QPainter
+from PySide6.QtCore import Qt, QLocale, QThread, QTimer, Signal, QDateTime, QPointF
+from PySide6.QtCharts import QChart, QChartView, QLineSeries, QScatterSeries, QDateTimeAxis, QValueAxis
+# 启动时只导入 Qt 和标准库模块；pandas、joblib 以及反序列化模型时导入的 sklearn
+# 在后台加载模型或首次预测时才导入，窗口无需等待它们即可显示
+from feature_spec import CITY_COLUMN, RESOLUTION, RESOLUTIONS, TIME_COLUMN, lag_name
+from instrumentation import count, span
+from latest_data import LatestRowCache, feature_inputs
 
 # 忽略警告
 warnings.filterwarnings('ignore', category=UserWarning)
 
-# 输入参数定义和合理范围
+# 输入参数定义和合理范围（参数名随 AQI_RESOLUTION 为 *_1天前 或 *_1小时前）
+PERIOD = RESOLUTIONS[RESOLUTION]['period']
 INPUT_PARAMS = [
-    ("AQI_1天前", "前一天AQI指数", "", (0, 500)),
-    ("PM2.5_1天前", "前一天PM2.5浓度", "μg/m³", (0, 300)),
-    ("PM10_1天前", "前一天PM10浓度", "μg/m³", (0, 500)),
-    ("So2_1天前", "前一天SO₂浓度", "μg/m³", (0, 100)),
-    ("No2_1天前", "前一天NO₂浓度", "μg/m³", (0, 150)),
-    ("O3_1天前", "前一天O₃浓度", "μg/m³", (0, 250)),
-    ("Co_1天前", "前一天CO浓度", "mg/m³", (0, 5))
+    (lag_name("AQI", 1), f"{PERIOD}AQI指数", "", (0, 500)),
+    (lag_name("PM2.5", 1), f"{PERIOD}PM2.5浓度", "μg/m³", (0, 300)),
+    (lag_name("PM10", 1), f"{PERIOD}PM10浓度", "μg/m³", (0, 500)),
+    (lag_name("So2", 1), f"{PERIOD}SO₂浓度", "μg/m³", (0, 100)),
+    (lag_name("No2", 1), f"{PERIOD}NO₂浓度", "μg/m³", (0, 150)),
+    (lag_name("O3", 1), f"{PERIOD}O₃浓度", "μg/m³", (0, 250)),
+    (lag_name("Co", 1), f"{PERIOD}CO浓度", "mg/m³", (0, 5))
 ]
 
+# AQI 等级上限、简称和颜色
+AQI_LEVELS = [
+    (50, "优", QColor(0, 228, 0)),  # 绿色
+    (100, "良", QColor(255, 255, 0)),  # 黄色
+    (150, "轻度", QColor(255, 126, 0)),  # 橙色
+    (200, "中度", QColor(255, 0, 0)),  # 红色
+    (300, "重度", QColor(153, 0, 76)),  # 紫色
+    (float('inf'), "严重", QColor(126, 0, 35)),  # 褐红色
+]
+
+# 趋势图默认显示最近多少个时间单位，缩放时最少显示多少个时间单位
+DASHBOARD_WINDOW = {'day': 90, 'hour': 7 * 24}
+DASHBOARD_MIN_WINDOW = {'day': 7, 'hour': 12}
+UNIT_MS = {'day': 86_400_000, 'hour': 3_600_000}
+
+# 自动刷新时检查数据文件是否有新观测的间隔（秒）
+LATEST_REFRESH_SECONDS = 60
+
+
+def history_path(city, resolution=RESOLUTION):
+    """数据采集脚本为每个城市写入的原始观测文件"""
+    return f'空气质量-{city}_{resolution}.csv'
+
+
+def to_chart_time(timestamps):
+    """不带时区的本地时间 → 时间轴使用的毫秒时间戳（数组）"""
+    import numpy as np
+    offset = QDateTime.currentDateTime().offsetFromUtc() * 1000
+    return np.asarray(timestamps, dtype='datetime64[ms]').astype(np.int64).astype(np.float64) - offset
+
+
+def from_chart_time(t):
+    """时间轴毫秒时间戳 → 不带时区的本地时间"""
+    import pandas as pd
+    return pd.Timestamp(int(t + QDateTime.currentDateTime().offsetFromUtc() * 1000), unit='ms')
+
+
+def query_forecasts(city, start=None, end=None):
+    """从预测日志读取一个城市目标时间在 [start, end) 内的预测值，返回 {模型: [(时间, 预测值), ...]}"""
+    from prediction_log import PredictionLog
+    logged = PredictionLog().query(start=start, end=end, time_column='目标时间',
+                                   columns=['目标时间', '预测值'], city=city)
+    forecasts = {}
+    if len(logged):
+        if end is not None:
+            logged = logged[logged['目标时间'] < end]
+        logged = logged.sort_values('目标时间')
+        logged_times = to_chart_time(logged['目标时间'].to_numpy())
+        for model_name, t, value in zip(logged['模型'], logged_times, logged['预测值']):
+            forecasts.setdefault(model_name, []).append((float(t), float(value)))
+    return forecasts
+
+
+MODELS_DIR = 'models'
+# 支持的模型（按下拉框顺序）
+MODEL_NAMES = ['随机森林', '梯度提升', '线性回归', '支持向量机', 'K近邻', '集成模型']
+
+
+def model_path(model_name, models_dir=MODELS_DIR):
+    return os.path.join(models_dir, f'{model_name}_model.pkl')
+
+
+def available_models(models_dir=MODELS_DIR):
+    """模型文件存在的模型名称（只检查文件，不加载）"""
+    return [name for name in MODEL_NAMES if os.path.exists(model_path(name, models_dir))]
+
+
+def load_model(model_name, models_dir=MODELS_DIR):
+    import joblib
+    return joblib.load(model_path(model_name, models_dir))
+
+
+class ModelLoader(QThread):
+    """在后台线程中依次加载模型，每加载完（或失败）一个发出一次信号"""
+    model_loaded = Signal(str, object, str)  # 模型名称, 模型, 模型版本
+    load_failed = Signal(str, str)  # 模型名称, 错误信息
+
+    def __init__(self, model_names, parent=None):
+        super().__init__(parent)
+        self.model_names = model_names
+
+    def run(self):
+        from prediction_log import model_version
+        for name in self.model_names:
+            if self.isInterruptionRequested():
+                return
+            try:
+                with span('加载模型', 模型=name):
+                    model = load_model(name)
+                self.model_loaded.emit(name, model, model_version(model_path(name)))
+            except Exception as e:
+                self.load_failed.emit(name, str(e))
+
 
 class AQIWidget(QWidget):
-    def __init__(self, aqi_value):
+    """AQI 色块：数值、等级和预测区间，标签只创建一次，set_value 时更新文字和背景色"""
+
+    def __init__(self, aqi_value=0, interval=None):
         super().__init__()
 
         # 设置背景色和固定大小
         self.setFixedSize(100, 100)
-        self.aqi_value = aqi_value
+        self.setAutoFillBackground(True)
         self.setup_ui()
+        self.set_value(aqi_value, interval)
 
     def setup_ui(self):
         # 创建垂直布局
         layout = QVBoxLayout(self)
 
         # 添加标签显示AQI值
-        aqi_label = QLabel(str(int(self.aqi_value)))
-        aqi_font = QFont("Arial", 24, QFont.Bold)
-        aqi_label.setFont(aqi_font)
-        aqi_label.setAlignment(Qt.AlignCenter)
+        self.aqi_label = QLabel()
+        self.aqi_label.setFont(QFont("Arial", 24, QFont.Bold))
+        self.aqi_label.setAlignment(Qt.AlignCenter)
 
         # 添加标签显示空气质量等级
-        level_label = QLabel("")
-        level_font = QFont("Arial", 12, QFont.Bold)
-        level_label.setFont(level_font)
-        level_label.setAlignment(Qt.AlignCenter)
+        self.level_label = QLabel()
+        self.level_label.setFont(QFont("Arial", 12, QFont.Bold))
+        self.level_label.setAlignment(Qt.AlignCenter)
+
+        # 预测区间
+        self.interval_label = QLabel()
+        self.interval_label.setFont(QFont("Arial", 9))
+        self.interval_label.setAlignment(Qt.AlignCenter)
+
+        # 添加到布局
+        layout.addWidget(self.aqi_label)
+        layout.addWidget(self.level_label)
+        layout.addWidget(self.interval_label)
+
+    def set_value(self, aqi_value, interval=None):
+        self.aqi_value = aqi_value
+        self.interval = interval
+        self.aqi_label.setText(str(int(aqi_value)))
 
         # 设置背景颜色基于AQI值
+        limit, level, color = next(item for item in AQI_LEVELS if aqi_value <= item[0])
+        self.level_label.setText(level)
         palette = self.palette()
+        palette.setColor(QPalette.Window, color)
+        self.setPalette(palette)
+
+        self.interval_label.setVisible(interval is not None)
+        if interval is not None:
+            self.interval_label.setText(f"{interval[0]:.0f}~{interval[1]:.0f}")
+
 
-        if self.aqi_value <= 50:
-            level_label.setText("优")
-            palette.setColor(QPalette.Window, QColor(0, 228, 0))  # 绿色
-        elif self.aqi_value <= 100:
-            level_label.setText("良")
-            palette.setColor(QPalette.Window, QColor(255, 255, 0))  # 黄色
-        elif self.aqi_value <= 150:
-            level_label.setText("轻度")
-            palette.setColor(QPalette.Window, QColor(255, 126, 0))  # 橙色
-        elif self.aqi_value <= 200:
-            level_label.setText("中度")
-            palette.setColor(QPalette.Window, QColor(255, 0, 0))  # 红色
-        elif self.aqi_value <= 300:
-            level_label.setText("重度")
-            palette.setColor(QPalette.Window, QColor(153, 0, 76))  # 紫色
+class HistoryLoader(QThread):
+    """
+    在后台线程中读取一个城市的历史实测 AQI，以及预测日志中最近窗口（含前后余量）内的预测值
+
+    更早的预测值在视野移过去时由 ForecastLoader 补读。
+    指定 prediction_log 时先在本线程中 flush，本次运行中尚在缓冲的预测一并读出，不阻塞界面线程。
+    """
+    loaded = Signal(str, object, object, object)  # 城市, (时间, AQI) 数组, {模型: [(时间, 预测值), ...]}, 已读取预测值的起点
+    failed = Signal(str, str)  # 城市, 错误信息
+
+    def __init__(self, city, prediction_log=None, parent=None):
+        super().__init__(parent)
+        self.city = city
+        self.prediction_log = prediction_log
+
+    def run(self):
+        import numpy as np
+        import pandas as pd
+        try:
+            with span('读取历史数据', 城市=self.city):
+                if self.prediction_log is not None:
+                    self.prediction_log.flush()
+                times = values = np.empty(0)
+                start = None
+                path = history_path(self.city)
+                if os.path.exists(path):
+                    data = pd.read_csv(path, usecols=[TIME_COLUMN, 'AQI指数'], parse_dates=[TIME_COLUMN])
+                    data = data.dropna().sort_values(TIME_COLUMN)
+                    times = to_chart_time(data[TIME_COLUMN].to_numpy())
+                    values = data['AQI指数'].to_numpy(dtype=np.float64)
+                    if len(data):
+                        # 最近窗口及其左侧同样宽度的余量（与重绘时的余量一致）
+                        start = data[TIME_COLUMN].iloc[-1] - pd.Timedelta(
+                            2 * DASHBOARD_WINDOW[RESOLUTION] * UNIT_MS[RESOLUTION], unit='ms')
+                forecasts = query_forecasts(self.city, start=start)
+            since = float(to_chart_time([start])[0]) if start is not None else None
+            self.loaded.emit(self.city, (times, values), forecasts, since)
+        except Exception as e:
+            self.failed.emit(self.city, str(e))
+
+
+class ForecastLoader(QThread):
+    """在后台线程中补读一个城市 [start, end) 内的预测值（时间为时间轴毫秒时间戳，start 为 None 表示不限）"""
+    loaded = Signal(str, object, object)  # 城市, {模型: [(时间, 预测值), ...]}, 新的已读取起点
+    failed = Signal(str, str)  # 城市, 错误信息
+
+    def __init__(self, city, start, end, parent=None):
+        super().__init__(parent)
+        self.city = city
+        self.start_time = start
+        self.end_time = end
+
+    def run(self):
+        try:
+            with span('读取预测日志', 城市=self.city):
+                start = from_chart_time(self.start_time) if self.start_time is not None else None
+                forecasts = query_forecasts(self.city, start=start, end=from_chart_time(self.end_time))
+            self.loaded.emit(self.city, forecasts, self.start_time)
+        except Exception as e:
+            self.failed.emit(self.city, str(e))
+
+
+class HistoryChartView(QChartView):
+    """滚轮缩放、左键拖动平移、双击回到最近的时间窗口"""
+    range_requested = Signal(float, float)
+    reset_requested = Signal()
+
+    def __init__(self, chart, parent=None):
+        super().__init__(chart, parent)
+        self.setRenderHint(QPainter.Antialiasing)
+        self.drag_x = None
+
+    def wheelEvent(self, event):
+        axis = self.chart().axes(Qt.Horizontal)[0]
+        low, high = axis.min().toMSecsSinceEpoch(), axis.max().toMSecsSinceEpoch()
+        center = self.chart().mapToValue(event.position()).x()
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        self.range_requested.emit(center - (center - low) * factor, center + (high - center) * factor)
+        event.accept()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.drag_x = event.position().x()
+            event.accept()
+        else:
+            super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self.drag_x is not None:
+            x = event.position().x()
+            self.chart().scroll(self.drag_x - x, 0)
+            self.drag_x = x
+            event.accept()
         else:
-            level_label.setText("严重")
-            palette.setColor(QPalette.Window, QColor(126, 0, 35))  # 褐红色
+            super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        self.drag_x = None
+        super().mouseReleaseEvent(event)
+
+    def mouseDoubleClickEvent(self, event):
+        self.reset_requested.emit()
+        event.accept()
+
+
+class AQIDashboard(QWidget):
+    """
+    历史实测 AQI 与滚动预测的趋势图
+
+    - 某个城市的历史数据在第一次显示时由后台线程读取，之后缓存在内存中；
+    - 只绘制可见时间范围（两侧各多留一个窗口宽度，平移时不需要等待重绘）内的数据，
+      并用 LTTB 降采样到与绘图区像素数相当的点数，缩放或平移停止后再重新降采样；
+    - 新的预测值和实测值直接追加到已有序列，图表和控件只创建一次。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.history = {}  # 城市 -> (时间数组, AQI数组)
+        self.forecasts = {}  # 城市 -> {模型: [(时间, 预测值), ...]}
+        self.pending = {}  # 城市 -> 读取期间产生的 [(模型, 时间, 预测值), ...]
+        self.forecast_since = {}  # 城市 -> 已读取预测值的最早目标时间（None 表示已全部读取）
+        self.loaders = {}
+        self.forecast_loaders = {}
+        self.prediction_log = None  # 本进程写入的预测日志，读取历史前在后台线程中 flush
+        self.city = None
+        self.model_name = None
+        self.drawn = None  # 当前已绘制的时间范围
+
+        # 缩放/平移停止一小段时间后再重新降采样
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setSingleShot(True)
+        self.redraw_timer.setInterval(40)
+        self.redraw_timer.timeout.connect(self.redraw)
+
+        self.observed_series = QLineSeries()
+        self.observed_series.setName("实测AQI")
+        self.forecast_series = QScatterSeries()
+        self.forecast_series.setName("预测AQI")
+        self.forecast_series.setMarkerSize(8)
+        self.forecast_series.setColor(QColor(244, 67, 54))
+
+        self.chart = QChart()
+        self.chart.addSeries(self.observed_series)
+        self.chart.addSeries(self.forecast_series)
+        self.chart.legend().setAlignment(Qt.AlignBottom)
+
+        self.x_axis = QDateTimeAxis()
+        self.x_axis.setFormat("yyyy-MM-dd" if RESOLUTION == 'day' else "MM-dd hh:mm")
+        self.x_axis.setTickCount(6)
+        self.y_axis = QValueAxis()
+        self.y_axis.setLabelFormat("%d")
+        self.y_axis.setTickType(QValueAxis.TicksDynamic)
+        self.y_axis.setTickAnchor(0)
+        self.y_axis.setTickInterval(50)
+        self.y_axis.setRange(0, 200)
+        self.chart.addAxis(self.x_axis, Qt.AlignBottom)
+        self.chart.addAxis(self.y_axis, Qt.AlignLeft)
+        for series in (self.observed_series, self.forecast_series):
+            series.attachAxis(self.x_axis)
+            series.attachAxis(self.y_axis)
+        self.x_axis.rangeChanged.connect(self.schedule_redraw)
+
+        self.view = HistoryChartView(self.chart)
+        self.view.range_requested.connect(self.set_range)
+        self.view.reset_requested.connect(self.show_recent)
+
+        self.info_label = QLabel("选择城市后显示历史实测与预测AQI（滚轮缩放，拖动平移，双击回到最近）")
+        self.info_label.setFont(QFont("Arial", 10))
 
-        self.setAutoFillBackground(True)
-        self.setPalette(palette)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.info_label)
+        layout.addWidget(self.view)
+
+    def show_city(self, city, model_name):
+        """显示指定城市和模型；历史数据尚未读取时在后台读取"""
+        self.model_name = model_name
+        if city == self.city and city in self.history:
+            self.update_forecast_series()
+            return
+        self.city = city
+        self.drawn = None
+        self.observed_series.clear()
+        self.forecast_series.clear()
+        if city in self.history:
+            self.show_recent()
+            return
+        self.info_label.setText(f"正在读取 {city} 的历史数据...")
+        if city not in self.loaders:
+            loader = HistoryLoader(city, self.prediction_log, self)
+            loader.loaded.connect(self.on_history_loaded)
+            loader.failed.connect(self.on_history_failed)
+            self.loaders[city] = loader
+            loader.start()
+
+    def show_message(self, text):
+        self.city = None
+        self.drawn = None
+        self.observed_series.clear()
+        self.forecast_series.clear()
+        self.info_label.setText(text)
+
+    def on_history_loaded(self, city, history, forecasts, since):
+        self.loaders.pop(city).deleteLater()
+        self.history[city] = history
+        self.forecasts[city] = forecasts
+        self.forecast_since[city] = since
+        # 读取期间的预测可能已在后台 flush 时写入日志并被读出，跳过重复的点
+        for model_name, t, value in self.pending.pop(city, []):
+            points = forecasts.setdefault(model_name, [])
+            if (t, value) not in points:
+                points.append((t, value))
+        if city == self.city:
+            self.show_recent()
+
+    def on_history_failed(self, city, error):
+        self.loaders.pop(city).deleteLater()
+        self.pending.pop(city, None)
+        if city == self.city:
+            self.info_label.setText(f"读取 {city} 的历史数据失败: {error}")
+
+    def load_earlier_forecasts(self, low):
+        """视野左端早于已读取的预测值时，在后台补读更早的预测值"""
+        since = self.forecast_since.get(self.city)
+        if since is None or low >= since or self.city in self.forecast_loaders:
+            return
+        times, _ = self.history[self.city]
+        # 一次多读一个窗口；已到实测数据开头时读取剩余全部
+        start = min(low, since - DASHBOARD_WINDOW[RESOLUTION] * UNIT_MS[RESOLUTION])
+        if len(times) and start <= times[0]:
+            start = None
+        loader = ForecastLoader(self.city, start, since, self)
+        loader.loaded.connect(self.on_forecasts_loaded)
+        loader.failed.connect(self.on_forecasts_failed)
+        self.forecast_loaders[self.city] = loader
+        loader.start()
+
+    def on_forecasts_loaded(self, city, forecasts, since):
+        self.forecast_loaders.pop(city).deleteLater()
+        self.forecast_since[city] = since
+        for model_name, points in forecasts.items():
+            self.forecasts[city][model_name] = points + self.forecasts[city].get(model_name, [])
+        if city == self.city and forecasts.get(self.model_name):
+            self.update_forecast_series()
+
+    def on_forecasts_failed(self, city, error):
+        self.forecast_loaders.pop(city).deleteLater()
+        if city == self.city:
+            self.info_label.setText(f"读取 {city} 的历史预测值失败: {error}")
+
+    def stop(self):
+        for loader in list(self.loaders.values()) + list(self.forecast_loaders.values()):
+            loader.wait()
+
+    # ---------- 时间范围 ----------
+
+    def data_extent(self):
+        """当前城市历史数据和预测值的最早、最晚时间"""
+        times, _ = self.history[self.city]
+        points = [t for t, _ in self.forecasts[self.city].get(self.model_name, [])]
+        candidates = points + ([times[0], times[-1]] if len(times) else [])
+        return (min(candidates), max(candidates)) if candidates else None
+
+    def show_recent(self):
+        """显示到最新实测值（没有实测值时到最新预测值）为止的 DASHBOARD_WINDOW 个时间单位"""
+        if self.city not in self.history:
+            return
+        extent = self.data_extent()
+        if extent is None:
+            self.info_label.setText(f"没有 {self.city} 的历史数据（{history_path(self.city)}）")
+            return
+        times, _ = self.history[self.city]
+        latest = times[-1] if len(times) else extent[1]
+        unit = UNIT_MS[RESOLUTION]
+        self.set_range(latest - DASHBOARD_WINDOW[RESOLUTION] * unit, latest + unit)
+        self.update_forecast_series()
+
+    def set_range(self, low, high):
+        """设置可见时间范围（限制在数据范围附近，不小于最小窗口）"""
+        if self.city not in self.history or self.data_extent() is None:
+            return
+        unit = UNIT_MS[RESOLUTION]
+        first, last = self.data_extent()
+        width = min(max(high - low, DASHBOARD_MIN_WINDOW[RESOLUTION] * unit), last - first + 2 * unit)
+        low = min(max(low, first - unit), last + unit - width)
+        self.x_axis.setRange(QDateTime.fromMSecsSinceEpoch(int(low)), QDateTime.fromMSecsSinceEpoch(int(low + width)))
 
-        # 添加到布局
-        layout.addWidget(aqi_label)
-        layout.addWidget(level_label)
+    def schedule_redraw(self, *args):
+        self.redraw_timer.start()
+
+    # ---------- 绘制 ----------
+
+    def redraw(self):
+        """按当前可见范围重新选取并降采样实测序列"""
+        if self.city not in self.history:
+            return
+        import numpy as np
+        from analysis_engine import lttb
+
+        times, values = self.history[self.city]
+        low, high = self.x_axis.min().toMSecsSinceEpoch(), self.x_axis.max().toMSecsSinceEpoch()
+        width = high - low
+        start = max(int(np.searchsorted(times, low - width)) - 1, 0)
+        end = min(int(np.searchsorted(times, high + width, side='right')) + 1, len(times))
+        x, y = times[start:end], values[start:end]
+        n_out = 3 * max(int(self.chart.plotArea().width()), 200)
+        if len(x) > n_out:
+            selected = lttb(x, y, n_out)
+            x, y = x[selected], y[selected]
+        with span('重绘趋势图', 点数=len(x)):
+            self.observed_series.replaceNp(x, y)
+        self.drawn = (times[start] if start < end else low, times[end - 1] if start < end else high)
+
+        visible = values[np.searchsorted(times, low):np.searchsorted(times, high, side='right')]
+        self.update_y_range(visible)
+        self.info_label.setText(f"{self.city}: 共 {len(times)} 条实测记录，当前绘制 {len(x)} 个点"
+                                "（滚轮缩放，拖动平移，双击回到最近）")
+        self.load_earlier_forecasts(low - width)
+
+    def update_y_range(self, visible):
+        candidates = [value for _, value in self.forecasts[self.city].get(self.model_name, [])] + [50]
+        if len(visible):
+            candidates.append(float(visible.max()))
+        self.y_axis.setRange(0, (int(max(candidates) * 1.1) // 50 + 1) * 50)
+
+    def update_forecast_series(self):
+        points = self.forecasts.get(self.city, {}).get(self.model_name, [])
+        # 一次替换全部点，只触发一次重绘
+        self.forecast_series.replace([QPointF(t, value) for t, value in points])
+
+    # ---------- 追加 ----------
+
+    def add_forecast(self, city, model_name, timestamp, value):
+        """追加一个预测值；当前正在显示的序列直接追加一个点"""
+        t = float(to_chart_time([timestamp])[0])
+        if city in self.history:
+            self.forecasts[city].setdefault(model_name, []).append((t, value))
+            if city == self.city and model_name == self.model_name:
+                self.forecast_series.append(t, value)
+                if value > self.y_axis.max():
+                    self.y_axis.setMax((int(value * 1.1) // 50 + 1) * 50)
+        elif city in self.loaders:
+            self.pending.setdefault(city, []).append((model_name, t, value))
+
+    def add_observation(self, city, timestamp, value):
+        """追加一个晚于已有数据的实测值；正在显示最新数据时视野随之右移"""
+        if city not in self.history:
+            return
+        import numpy as np
+        t = float(to_chart_time([timestamp])[0])
+        times, values = self.history[city]
+        if len(times) and t <= times[-1]:
+            return
+        self.history[city] = (np.append(times, t), np.append(values, value))
+        if city == self.city and self.drawn is not None:
+            self.observed_series.append(t, value)
+            if not len(times) or self.x_axis.max().toMSecsSinceEpoch() >= times[-1]:
+                self.show_recent()
 
 
 class AirQualityPredictionApp(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.models = self.load_models()
+        # 启动时只检查模型文件是否存在，模型在窗口显示后由后台线程加载，加载完一个即可用一个
+        self.model_names = available_models()
+        self.models = {}
+        self.model_versions = {}
+        self.load_errors = {}
+        self.model_loader = None
+        self.explainers = {}
+        # 每次预测的输入、模型版本、输出和耗时由后台线程批量写入预测日志（首次预测时创建）
+        self.prediction_log = None
+        # 各城市数据文件的最新一行，latest_row 为当前输入来自的观测（手动修改输入后为 None）
+        self.latest_cache = LatestRowCache()
+        self.latest_row = None
+        self.latest_seen = None
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(LATEST_REFRESH_SECONDS * 1000)
+        self.refresh_timer.timeout.connect(self.refresh_latest)
         self.init_ui()
         # 添加白底黑字主题
         self.apply_white_theme()
+        # 事件循环开始（窗口显示）后再启动加载
+        QTimer.singleShot(0, self.start_model_loader)
+
+    def start_model_loader(self):
+        """在后台线程中加载模型，状态栏显示进度"""
+        if not self.model_names:
+            return
+        self.model_loader = ModelLoader(self.model_names, self)
+        self.model_loader.model_loaded.connect(self.on_model_loaded)
+        self.model_loader.load_failed.connect(self.on_model_load_failed)
+        self.model_loader.start()
+
+    def on_model_loaded(self, model_name, model, version):
+        self.models[model_name] = model
+        self.model_versions[model_name] = version
+        print(f"✅ 成功加载模型: {model_name}")
+        self.update_cities()
+        self.update_predict_button()
+        self.update_load_progress()
+
+    def on_model_load_failed(self, model_name, error):
+        self.load_errors[model_name] = error
+        print(f"❌ 加载模型 {model_name} 时出错: {error}")
+        self.update_predict_button()
+        self.update_load_progress()
+
+    def update_load_progress(self):
+        done = len(self.models) + len(self.load_errors)
+        self.load_progress.setValue(done)
+        if done < len(self.model_names):
+            return
+        self.load_progress.hide()
+        if self.load_errors:
+            self.status_bar.showMessage(f"{len(self.load_errors)} 个模型加载失败: {', '.join(self.load_errors)}")
+        else:
+            self.status_bar.showMessage(f"准备预测 - 输入{PERIOD}的空气质量数据")
+
+    def update_cities(self):
+        """城市列表为已加载的全局模型所支持城市的并集"""
+        cities = sorted({city for model in self.models.values() for city in getattr(model, 'cities_', [])})
+        current = [self.city_combo.itemText(i) for i in range(self.city_combo.count())]
+        if not cities or cities == current:
+            return
+        selected = self.city_combo.currentText()
+        self.city_combo.clear()
+        self.city_combo.addItems(cities)
+        if selected in cities:
+            self.city_combo.setCurrentText(selected)
+        self.city_combo.setEnabled(True)
+
+    def update_predict_button(self):
+        """当前选择的模型加载完成后才能预测"""
+        model_name = self.model_combo.currentText()
+        self.predict_button.setEnabled(model_name in self.models)
+        if model_name in self.load_errors:
+            self.predict_button.setToolTip(f"模型加载失败: {self.load_errors[model_name]}")
+        elif model_name in self.model_names and model_name not in self.models:
+            self.predict_button.setToolTip("模型正在加载...")
+        else:
+            self.predict_button.setToolTip("")
+
+    def closeEvent(self, event):
+        self.refresh_timer.stop()
+        # 不再加载剩余模型，等待正在反序列化的模型和正在读取的历史数据完成后退出
+        if self.model_loader is not None and self.model_loader.isRunning():
+            self.model_loader.requestInterruption()
+            self.model_loader.wait()
+        self.dashboard.stop()
+        super().closeEvent(event)
 
     def apply_white_theme(self):
         """应用白底黑字主题"""
@@ -160,52 +701,6 @@ class AirQualityPredictionApp(QMainWindow):
             }
         """)
 
-    def load_models(self):
-        """加载所有可用模型"""
-        models = {}
-        models_dir = 'models'
-
-        # 检查models目录是否存在
-        if not os.path.exists(models_dir):
-            print(f"警告: 模型目录 '{models_dir}' 不存在")
-            return models
-
-        print(f"从目录 '{models_dir}' 加载模型...")
-
-        # 支持的模型文件列表
-        model_files = [
-            '随机森林_model.pkl',
-            '梯度提升_model.pkl',
-            '线性回归_model.pkl',
-            '支持向量机_model.pkl',
-            'K近邻_model.pkl'
-        ]
-
-        for model_file in model_files:
-            model_path = os.path.join(models_dir, model_file)
-            model_name = model_file.replace('_model.pkl', '')
-
-            # 检查模型文件是否存在
-            if not os.path.exists(model_path):
-                print(f"警告: 模型文件 '{model_path}' 不存在")
-                continue
-
-            try:
-                print(f"加载模型: {model_name}")
-                model = joblib.load(model_path)
-                models[model_name] = model
-                print(f"✅ 成功加载模型: {model_name}")
-            except Exception as e:
-                print(f"❌ 加载模型 {model_name} 时出错: {str(e)}")
-
-        # 检查是否加载了任何模型
-        if not models:
-            print("警告: 没有加载任何模型!")
-        else:
-            print(f"成功加载 {len(models)} 个模型")
-
-        return models
-
     def init_ui(self):
         """初始化UI界面"""
         self.setWindowTitle("空气质量预测系统")
@@ -254,6 +749,7 @@ class AirQualityPredictionApp(QMainWindow):
             line_edit.setPlaceholderText(f"{value_range[0]}-{value_range[1]}")
             line_edit.setMinimumWidth(150)
             line_edit.setValidator(validator)  # 设置验证器只允许数字输入
+            line_edit.textEdited.connect(self.on_input_edited)
             self.input_fields[param_name] = line_edit
 
             # 添加单位标签
@@ -277,9 +773,9 @@ class AirQualityPredictionApp(QMainWindow):
 
         self.model_combo = QComboBox()
 
-        # 只添加实际加载的模型
-        if self.models:
-            self.model_combo.addItems(list(self.models.keys()))
+        # 添加模型文件存在的模型，加载完成前对应的预测按钮不可用
+        if self.model_names:
+            self.model_combo.addItems(self.model_names)
             self.model_combo.setCurrentIndex(0)
         else:
             # 如果没有模型，添加一个警告项
@@ -287,12 +783,27 @@ class AirQualityPredictionApp(QMainWindow):
 
         self.model_combo.setMinimumWidth(150)
 
+        # 城市选择（全局模型一个文件服务所有城市）
+        city_label = QLabel("城市:")
+        city_label.setFont(label_font)
+
+        self.city_combo = QComboBox()
+        # 模型加载后由 update_cities 填入支持的城市
+        self.city_combo.addItem("默认")
+        self.city_combo.setEnabled(False)
+        self.city_combo.setMinimumWidth(120)
+
         # 按钮
         self.predict_button = QPushButton("预测")
         self.predict_button.setFont(QFont("Arial", 11, QFont.Bold))
-        self.predict_button.setStyleSheet("background-color: #4CAF50; color: white; padding: 8px 16px;")
+        self.predict_button.setStyleSheet(
+            "QPushButton { background-color: #4CAF50; color: white; padding: 8px 16px; }"
+            "QPushButton:disabled { background-color: #A5D6A7; }"
+        )
         self.predict_button.setMinimumSize(100, 40)
         self.predict_button.clicked.connect(self.predict)
+        self.model_combo.currentTextChanged.connect(self.update_predict_button)
+        self.update_predict_button()
 
         self.clear_button = QPushButton("清空")
         self.clear_button.setFont(QFont("Arial", 11))
@@ -306,41 +817,78 @@ class AirQualityPredictionApp(QMainWindow):
         self.info_button.setMinimumSize(100, 40)
         self.info_button.clicked.connect(self.show_param_info)
 
+        # 用所选城市最新一天（小时）的观测填写输入并预测下一天（小时）
+        self.latest_button = QPushButton("最新数据")
+        self.latest_button.setFont(QFont("Arial", 11))
+        self.latest_button.setStyleSheet("background-color: #FF9800; color: white; padding: 8px 16px;")
+        self.latest_button.setMinimumSize(100, 40)
+        self.latest_button.setToolTip(f"读取 空气质量-{{城市}}_{RESOLUTION}.csv 的最新观测并预测")
+        self.latest_button.clicked.connect(self.use_latest_data)
+
+        self.auto_refresh_check = QCheckBox("自动刷新")
+        self.auto_refresh_check.setToolTip(f"每 {LATEST_REFRESH_SECONDS} 秒检查一次是否有新的观测，有则重新预测")
+        self.auto_refresh_check.toggled.connect(self.on_auto_refresh_toggled)
+        self.city_combo.currentTextChanged.connect(self.on_city_changed)
+
         options_layout.addWidget(model_label)
         options_layout.addWidget(self.model_combo)
+        options_layout.addWidget(city_label)
+        options_layout.addWidget(self.city_combo)
+        options_layout.addWidget(self.auto_refresh_check)
         options_layout.addStretch(1)
+        options_layout.addWidget(self.latest_button)
         options_layout.addWidget(self.info_button)
         options_layout.addWidget(self.clear_button)
         options_layout.addWidget(self.predict_button)
 
         main_layout.addLayout(options_layout)
 
-        # 4. 结果显示区域
+        # 4. 结果显示区域（预测结果 / 趋势图两个标签页）
         result_group = QGroupBox("预测结果")
-        result_layout = QVBoxLayout(result_group)
+        group_layout = QVBoxLayout(result_group)
+        self.result_tabs = QTabWidget()
+        group_layout.addWidget(self.result_tabs)
+
+        result_page = QWidget()
+        result_layout = QVBoxLayout(result_page)
 
         self.result_display = QTextEdit()
         self.result_display.setReadOnly(True)
         self.result_display.setFont(QFont("Arial", 12))
 
-        # 添加AQI可视化组件
+        # 添加AQI可视化组件（控件只创建一次，预测后更新内容）
         self.aqi_widget = QWidget()
         aqi_layout = QHBoxLayout(self.aqi_widget)
         aqi_layout.setAlignment(Qt.AlignCenter)
-        self.aqi_layout = aqi_layout
+        self.setup_aqi_display(aqi_layout)
 
         # 初始显示AQI为0
         self.update_aqi_display(0)
 
         result_layout.addWidget(self.result_display, 60)
         result_layout.addWidget(self.aqi_widget, 40)
+        self.result_tabs.addTab(result_page, "预测结果")
+
+        # 历史实测与预测趋势图，切换到该标签页时才读取历史数据
+        self.dashboard = AQIDashboard()
+        self.result_tabs.addTab(self.dashboard, "趋势图")
+        self.result_tabs.currentChanged.connect(self.refresh_dashboard)
+        self.city_combo.currentTextChanged.connect(self.refresh_dashboard)
+        self.model_combo.currentTextChanged.connect(self.refresh_dashboard)
         main_layout.addWidget(result_group)
 
         # 5. 设置状态栏
         self.status_bar = QStatusBar()
-        if self.models:
-            self.status_bar.showMessage("准备预测 - 输入前一天的空气质量数据")
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, len(self.model_names))
+        self.load_progress.setValue(0)
+        self.load_progress.setFormat("加载模型 %v/%m")
+        self.load_progress.setMaximumWidth(180)
+        self.status_bar.addPermanentWidget(self.load_progress)
+        if self.model_names:
+            self.status_bar.showMessage("正在后台加载模型，可先输入参数...")
         else:
+            self.load_progress.hide()
             self.status_bar.showMessage("警告: 没有可用的模型 - 请先运行模型训练脚本")
         self.setStatusBar(self.status_bar)
 
@@ -440,67 +988,146 @@ class AirQualityPredictionApp(QMainWindow):
         """清空输入字段"""
         for field in self.input_fields.values():
             field.clear()
+        self.latest_row = None
         self.result_display.clear()
         self.update_aqi_display(0)  # 重置AQI显示
         self.status_bar.showMessage("所有输入已清空")
 
-    def update_aqi_display(self, aqi_value):
-        """更新AQI显示组件"""
-        # 清除现有AQI显示
-        while self.aqi_layout.count():
-            child = self.aqi_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+    def latest_city(self):
+        """查询最新数据使用的城市：所选城市；模型不区分城市时为唯一的数据文件对应的城市"""
+        if self.city_combo.isEnabled():
+            return self.city_combo.currentText()
+        cities = self.latest_cache.cities()
+        return cities[0] if len(cities) == 1 else None
+
+    def use_latest_data(self):
+        """用所选城市最新一行观测填写输入并立即预测"""
+        city = self.latest_city()
+        if city is None:
+            self.status_bar.showMessage("请先选择城市（模型加载后可选）")
+            return
+        row = self.latest_cache.latest(city)
+        if row is None:
+            self.status_bar.showMessage(f"没有找到 {city} 的观测数据文件（空气质量-{city}_{RESOLUTION}.csv）")
+            return
+        self.fill_latest(row)
+        if self.predict():
+            self.latest_seen = (row.city, row.time)
+
+    def fill_latest(self, row):
+        for name, value in feature_inputs(row).items():
+            self.input_fields[name].setText('' if value is None else f'{value:g}')
+        self.latest_row = row
+        # 趋势图追加新的实测值（已读取过该城市历史数据时）
+        if row.values['AQI指数'] is not None:
+            self.dashboard.add_observation(row.city, row.time, row.values['AQI指数'])
+
+    def refresh_latest(self):
+        """
+        定时检查：所选城市有新的观测时重新填写并预测（数据文件未变化时只有一次 stat）
 
-        # 创建容器
-        container = QWidget()
-        layout = QHBoxLayout(container)
+        只有预测成功才记为已处理，失败（如模型仍在加载、数据超出范围）时下次定时检查重试；
+        错误只显示在状态栏，不弹出对话框。
+        """
+        city = self.latest_city()
+        row = self.latest_cache.latest(city) if city is not None else None
+        if row is None or (row.city, row.time) == self.latest_seen:
+            return
+        self.fill_latest(row)
+        if self.predict(quiet=True):
+            self.latest_seen = (row.city, row.time)
+
+    def on_auto_refresh_toggled(self, checked):
+        if checked:
+            self.refresh_timer.start()
+            self.refresh_latest()
+        else:
+            self.refresh_timer.stop()
+
+    def on_city_changed(self, city):
+        # 输入来自其他城市的观测时不再视为该城市的最新数据，预测和日志都使用所选城市
+        if self.latest_row is not None and self.latest_row.city != city:
+            self.latest_row = None
+        if self.auto_refresh_check.isChecked():
+            self.refresh_latest()
+
+    def on_input_edited(self, text):
+        # 手动修改后输入不再对应某一条观测
+        self.latest_row = None
+
+    def setup_aqi_display(self, layout):
+        """创建AQI显示组件：结果面板（色块 + 描述）和无结果时的提示"""
+        self.result_panel = QWidget()
+        panel_layout = QHBoxLayout(self.result_panel)
+
+        # 添加AQI数值显示
+        self.aqi_display = AQIWidget()
+        panel_layout.addWidget(self.aqi_display)
+
+        # 添加空气质量描述
+        desc_widget = QWidget()
+        desc_layout = QVBoxLayout(desc_widget)
+
+        self.aqi_value_label = QLabel()
+        self.aqi_value_label.setFont(QFont("Arial", 14, QFont.Bold))
+        self.aqi_value_label.setAlignment(Qt.AlignCenter)
+
+        self.interval_label = QLabel()
+        self.interval_label.setFont(QFont("Arial", 12))
+        self.interval_label.setAlignment(Qt.AlignCenter)
+
+        self.level_label = QLabel()
+        self.level_label.setFont(QFont("Arial", 12))
+        self.level_label.setAlignment(Qt.AlignCenter)
+
+        self.desc_label = QLabel()
+        self.desc_label.setFont(QFont("Arial", 10))
+        self.desc_label.setAlignment(Qt.AlignCenter)
+        self.desc_label.setWordWrap(True)
+
+        desc_layout.addWidget(self.aqi_value_label)
+        desc_layout.addWidget(self.interval_label)
+        desc_layout.addWidget(self.level_label)
+        desc_layout.addWidget(self.desc_label)
+        panel_layout.addWidget(desc_widget)
+
+        # 当AQI为0时显示的提示信息
+        self.prompt_label = QLabel()
+        self.prompt_label.setFont(QFont("Arial", 14, QFont.Bold))
+        self.prompt_label.setAlignment(Qt.AlignCenter)
+        self.prompt_label.setStyleSheet("background-color: #F0F0F0;")
+
+        layout.addWidget(self.result_panel)
+        layout.addWidget(self.prompt_label)
+
+    def update_aqi_display(self, aqi_value, interval=None):
+        """更新AQI显示组件，interval 为 (下限, 上限)"""
+        self.result_panel.setVisible(bool(aqi_value > 0))
+        self.prompt_label.setVisible(bool(aqi_value <= 0))
 
         if aqi_value > 0:
-            # 添加AQI数值显示
-            aqi_display = AQIWidget(aqi_value)
-            layout.addWidget(aqi_display)
-
-            # 添加空气质量描述
-            desc_widget = QWidget()
-            desc_layout = QVBoxLayout(desc_widget)
-
-            # 添加AQI数值
-            aqi_value_label = QLabel(f"空气质量指数: {aqi_value:.0f}")
-            aqi_value_label.setFont(QFont("Arial", 14, QFont.Bold))
-            aqi_value_label.setAlignment(Qt.AlignCenter)
-
-            # 添加等级和健康影响
+            self.aqi_display.set_value(aqi_value, interval)
+            self.aqi_value_label.setText(f"空气质量指数: {aqi_value:.0f}")
+            self.interval_label.setVisible(interval is not None)
+            if interval is not None:
+                self.interval_label.setText(f"90%预测区间: {interval[0]:.0f} ~ {interval[1]:.0f}")
             level, description = self.get_air_quality_description(aqi_value)
-            level_label = QLabel(f"空气质量等级: {level}")
-            level_label.setFont(QFont("Arial", 12))
-            level_label.setAlignment(Qt.AlignCenter)
-
-            desc_label = QLabel(f"健康影响: {description}")
-            desc_label.setFont(QFont("Arial", 10))
-            desc_label.setAlignment(Qt.AlignCenter)
-            desc_label.setWordWrap(True)
-
-            desc_layout.addWidget(aqi_value_label)
-            desc_layout.addWidget(level_label)
-            desc_layout.addWidget(desc_label)
-
-            layout.addWidget(desc_widget)
-
-            container.setVisible(True)
+            self.level_label.setText(f"空气质量等级: {level}")
+            self.desc_label.setText(f"健康影响: {description}")
+        elif self.model_names:
+            self.prompt_label.setText("请填写参数并点击'预测'按钮")
         else:
-            # 当AQI为0时，显示提示信息
-            if self.models:
-                prompt_label = QLabel("请填写参数并点击'预测'按钮")
-            else:
-                prompt_label = QLabel("⚠️ 没有可用的模型 - 请先运行模型训练脚本")
-
-            prompt_label.setFont(QFont("Arial", 14, QFont.Bold))
-            prompt_label.setAlignment(Qt.AlignCenter)
-            layout.addWidget(prompt_label)
-            container.setStyleSheet("background-color: #F0F0F0;")
+            self.prompt_label.setText("⚠️ 没有可用的模型 - 请先运行模型训练脚本")
 
-        self.aqi_layout.addWidget(container)
+    def refresh_dashboard(self, *args):
+        """趋势图标签页可见时显示当前城市和模型"""
+        if self.result_tabs.currentWidget() is not self.dashboard:
+            return
+        if not self.city_combo.isEnabled():
+            self.dashboard.show_message("当前没有按城市区分的模型，无法显示城市历史数据")
+            return
+        city = self.city_combo.currentText()
+        self.dashboard.show_city(city, self.model_combo.currentText())
 
     def get_air_quality_description(self, aqi):
         """获取空气质量描述信息"""
@@ -517,12 +1144,14 @@ class AirQualityPredictionApp(QMainWindow):
         else:
             return "严重污染", "健康人群运动耐受力降低，有明显强烈症状，提前出现某些疾病。建议儿童、老年人和病人应当留在室内避免体力消耗，一般人群避免户外活动。"
 
-    def validate_input(self, name, value):
-        """验证输入值是否在合理范围内"""
+    def validate_input(self, name, value, quiet=False):
+        """验证输入值是否在合理范围内（quiet 为 True 时不弹出对话框）"""
         param_info = next(p for p in INPUT_PARAMS if p[0] == name)
         min_val, max_val = param_info[3]
 
         if value < min_val:
+            if quiet:
+                return False
             QMessageBox.warning(
                 self, "输入值过低",
                 f"{name} 的值不能低于 {min_val}\n您输入的是: {value}"
@@ -530,6 +1159,8 @@ class AirQualityPredictionApp(QMainWindow):
             return False
 
         if value > max_val:
+            if quiet:
+                return False
             QMessageBox.warning(
                 self, "输入值过高",
                 f"{name} 的值不能超过 {max_val}\n您输入的是: {value}"
@@ -538,17 +1169,30 @@ class AirQualityPredictionApp(QMainWindow):
 
         return True
 
-    def predict(self):
-        """执行预测功能"""
+    def get_explainer(self, model_name):
+        """按需预编译并缓存模型解释器，不支持解释的模型返回 None"""
+        if model_name not in self.explainers:
+            from explain import ModelExplainer, supports_explanation
+            model = self.models[model_name]
+            self.explainers[model_name] = ModelExplainer(model) if supports_explanation(model) else None
+        return self.explainers[model_name]
+
+    def predict(self, *, quiet=False):
+        """
+        执行预测功能，成功时返回 True
+
+        quiet 为 True（自动刷新）时不弹出对话框，错误只显示在状态栏和结果区。
+        """
         # 如果没有可用的模型，显示警告
-        if not self.models:
-            QMessageBox.warning(
-                self,
-                "没有可用的模型",
-                "没有找到任何可用的预测模型。\n\n请确保您已经运行了模型训练脚本，并且模型文件保存在'models'目录中。"
-            )
+        if not self.model_names:
+            if not quiet:
+                QMessageBox.warning(
+                    self,
+                    "没有可用的模型",
+                    "没有找到任何可用的预测模型。\n\n请确保您已经运行了模型训练脚本，并且模型文件保存在'models'目录中。"
+                )
             self.status_bar.showMessage("错误: 没有可用的模型")
-            return
+            return False
 
         self.status_bar.showMessage("正在验证输入...")
 
@@ -570,7 +1214,7 @@ class AirQualityPredictionApp(QMainWindow):
                     continue
 
                 # 验证输入范围
-                if not self.validate_input(name, value):
+                if not self.validate_input(name, value, quiet=quiet):
                     errors.append(f"{name} 的值超出合理范围")
 
                 # 存储值
@@ -579,41 +1223,91 @@ class AirQualityPredictionApp(QMainWindow):
             if errors:
                 error_msg = "发现以下错误:\n- " + "\n- ".join(errors)
                 self.result_display.setText(error_msg)
-                self.status_bar.showMessage("输入验证失败")
-                return
+                self.status_bar.showMessage("输入验证失败: " + "; ".join(errors) if quiet else "输入验证失败")
+                return False
 
         except Exception as e:
             self.result_display.setText(f"错误: {str(e)}")
             self.status_bar.showMessage(f"输入验证错误: {str(e)}")
-            return
+            return False
 
         # 选择模型
         model_name = self.model_combo.currentText()
         if model_name not in self.models:
-            self.result_display.setText(f"错误: 未找到模型 {model_name}")
-            self.status_bar.showMessage(f"未找到模型 {model_name}")
-            return
+            if model_name in self.load_errors:
+                message = f"模型 {model_name} 加载失败: {self.load_errors[model_name]}"
+            elif model_name in self.model_names:
+                message = f"模型 {model_name} 正在加载，请稍候"
+            else:
+                message = f"未找到模型 {model_name}"
+            self.result_display.setText(f"错误: {message}")
+            self.status_bar.showMessage(message)
+            return False
 
         self.status_bar.showMessage("正在执行预测...")
+        # 模型加载时已导入 pandas，这里只是取得模块
+        import pandas as pd
 
         # 创建DataFrame - 确保字段顺序正确
         field_names = [name for name, _, _, _ in INPUT_PARAMS]
         input_values = [input_data[name] for name in field_names]
         input_df = pd.DataFrame([input_values], columns=field_names)
 
+        # 全局模型需要城市列
+        model = self.models[model_name]
+        city = self.city_combo.currentText()
+        if getattr(model, 'cities_', None):
+            input_df[CITY_COLUMN] = city
+        elif self.latest_row is not None:
+            # 模型不区分城市时，日志记录输入观测所属的城市
+            city = self.latest_row.city
+
         # 预测
         try:
-            prediction = self.models[model_name].predict(input_df)
+            start = time.perf_counter()
+            # 点预测与预测区间在同一次计算中得到
+            with span('GUI预测', 模型=model_name):
+                if hasattr(model, 'predict_interval'):
+                    prediction, lower, upper = model.predict_interval(input_df)
+                    interval = (lower[0], upper[0])
+                else:
+                    prediction = model.predict(input_df)
+                    interval = None
+            count('GUI预测次数')
             aqi_value = prediction[0]
+            latency_ms = (time.perf_counter() - start) * 1000
 
             # 获取空气质量描述
             level, description = self.get_air_quality_description(aqi_value)
 
             # 显示结果
             result_text = f"<b>预测模型</b>: {model_name}<br>"
+            if getattr(model, 'cities_', None):
+                result_text += f"<b>城市</b>: {city}<br>"
+            # 输入来自最新观测时预测的是其下一个时间单位，否则为当前时间单位
+            freq = RESOLUTIONS[RESOLUTION]['freq']
+            if self.latest_row is not None:
+                target_time = pd.Timestamp(self.latest_row.time) + pd.Timedelta(1, unit=freq)
+                result_text += f"<b>输入数据</b>: {self.latest_row.city} {self.latest_row.time} 的观测<br>"
+                result_text += f"<b>预测时间</b>: {target_time}<br>"
+            else:
+                target_time = pd.Timestamp.now().floor(freq)
             result_text += f"<b>预测AQI指数</b>: {aqi_value:.0f}<br>"
+            if interval is not None:
+                result_text += f"<b>90%预测区间</b>: {interval[0]:.0f} ~ {interval[1]:.0f}<br>"
             result_text += f"<b>空气质量等级</b>: {level}<br><br>"
             result_text += f"<b>健康影响</b>: {description}<br><br>"
+
+            # 特征贡献解释
+            explainer = self.get_explainer(model_name)
+            if explainer is not None:
+                with span('GUI解释', 模型=model_name):
+                    base_value, contributions = explainer.explain(input_df)
+                top = contributions.iloc[0].sort_values(key=abs, ascending=False)
+                result_text += f"<b>主要影响因素</b> (基准值 {base_value.iloc[0]:.0f}):<br>"
+                for feature, value in top.head(4).items():
+                    result_text += f"- {feature}: {value:+.1f}<br>"
+                result_text += "<br>"
             result_text += "<b>输入参数</b>:<br>"
 
             for param in INPUT_PARAMS:
@@ -625,9 +1319,29 @@ class AirQualityPredictionApp(QMainWindow):
             self.result_display.setText(result_text)
 
             # 更新AQI可视化
-            self.update_aqi_display(aqi_value)
+            self.update_aqi_display(aqi_value, interval)
 
             self.status_bar.showMessage(f"预测完成 - AQI: {aqi_value:.0f} ({level})")
+
+            # 记录到预测日志（目标时间用于与之后采集的实际值关联）
+            if self.prediction_log is None:
+                from prediction_log import PredictionLog
+                self.prediction_log = PredictionLog()
+                self.dashboard.prediction_log = self.prediction_log
+            self.prediction_log.append({
+                '目标时间': target_time,
+                '模型': model_name,
+                '模型版本': self.model_versions[model_name],
+                '城市': city,
+                '预测值': float(aqi_value),
+                '下限': float(interval[0]) if interval is not None else float('nan'),
+                '上限': float(interval[1]) if interval is not None else float('nan'),
+                '延迟毫秒': latency_ms,
+                **input_data,
+            })
+            # 趋势图追加一个预测点
+            self.dashboard.add_forecast(city, model_name, target_time, float(aqi_value))
+            return True
         except Exception as e:
             error_msg = f"<b>预测错误</b>: {str(e)}"
             error_msg += "<br><br>可能原因:<br>"
@@ -638,9 +1352,68 @@ class AirQualityPredictionApp(QMainWindow):
             self.result_display.setText(error_msg)
             self.status_bar.showMessage(f"预测错误: {str(e)}")
             print(f"预测错误: {str(e)}")
+            return False
+
+
+def predict_batch(input_path, output_path, model_name):
+    """批量预测：读取包含输入参数列（可选城市列）的CSV，输出预测值与预测区间"""
+    import pandas as pd
+    from explain import ModelExplainer, supports_explanation
+
+    # 只加载要使用的模型
+    if not os.path.exists(model_path(model_name)):
+        raise FileNotFoundError(f"模型文件 {model_path(model_name)} 不存在，"
+                                f"可用模型: {', '.join(available_models()) or '无（请先运行模型训练脚本）'}")
+    model = load_model(model_name)
+
+    data = pd.read_csv(input_path)
+    field_names = [name for name, _, _, _ in INPUT_PARAMS]
+    missing = set(field_names) - set(data.columns)
+    if missing:
+        raise ValueError(f"输入文件缺少必需的列: {', '.join(missing)}")
+    columns = field_names + ([CITY_COLUMN] if CITY_COLUMN in data.columns else [])
+    input_df = data[columns]
+
+    with span('批量预测', 模型=model_name, 行数=len(input_df)):
+        if hasattr(model, 'predict_interval'):
+            prediction, lower, upper = model.predict_interval(input_df)
+            data['预测AQI指数'] = prediction
+            data['下限'] = lower
+            data['上限'] = upper
+        else:
+            data['预测AQI指数'] = model.predict(input_df)
+
+    # 特征贡献
+    if supports_explanation(model):
+        with span('批量解释', 模型=model_name):
+            base_value, contributions = ModelExplainer(model).explain(input_df)
+        data['基准值'] = base_value
+        for feature in contributions.columns:
+            data[f'贡献_{feature}'] = contributions[feature]
+    data['空气质量等级'] = pd.cut(
+        data['预测AQI指数'], bins=[-float('inf'), 50, 100, 150, 200, 300, float('inf')],
+        labels=['优', '良', '轻度污染', '中度污染', '重度污染', '严重污染']
+    )
+    data.to_csv(output_path, index=False)
+    print(f"批量预测完成，共 {len(data)} 条，结果已保存至 {output_path}")
 
 
 if __name__ == "__main__":
+    # 批量模式: python 5.预测.py --batch 输入.csv [--output 输出.csv] [--model 模型名称]
+    if '--batch' in sys.argv:
+        import argparse
+        parser = argparse.ArgumentParser(description="空气质量批量预测")
+        parser.add_argument('--batch', required=True, help="输入CSV文件")
+        parser.add_argument('--output', default='batch_predictions.csv', help="输出CSV文件")
+        parser.add_argument('--model', default='集成模型', help="使用的模型名称")
+        args = parser.parse_args()
+        try:
+            predict_batch(args.batch, args.output, args.model)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"❌ 批量预测失败: {e}")
+            sys.exit(1)
+        sys.exit(0)
+
     # 创建应用
     app = QApplication(sys.argv)
 
@@ -0,0 +1,112 @@
+import argparse
+import glob
+import io
+import json
+import os
+import re
+import joblib
+import pandas as pd
+from city_model import CITY_COLUMN
+from data_quality import FLATLINE_RUN, screen
+from instrumentation import span
+from latest_data import read_since
+from monitoring import MONITOR_DIR, ONLINE_SUFFIX, MonitorState, load_profile, profile_statistics, retrain_reasons
+from prediction_log import PredictionLog
+from timeseries_features import LAGS, RESOLUTIONS, TIME_COLUMN, build_lag_features, downcast, raw_file_pattern
+
+# 每次采集后运行：用已部署模型预测新采集的观测，累计滚动误差和特征漂移
+parser = argparse.ArgumentParser(description="已部署模型的漂移与性能监控")
+parser.add_argument('--retrain', action='store_true', help="超过阈值时自动重新运行数据处理和模型训练")
+args = parser.parse_args()
+
+profile = load_profile()
+resolution = profile['resolution']
+features = profile['features']
+freq = RESOLUTIONS[resolution]['freq']
+# 质量检查使用训练数据上的按城市统计量，而不是只由少量新观测计算
+quality_stats = profile_statistics(profile)
+state = MonitorState(profile)
+
+# 1. 只从文件末尾读取每个城市上次处理之后的观测（以及滞后特征和恒定值检查所需的前几个时间单位）
+context = pd.Timedelta(max(max(LAGS), FLATLINE_RUN[resolution]), unit=freq)
+frames = []
+for file_path in sorted(glob.glob(raw_file_pattern(resolution))):
+    city = re.match(rf'空气质量-(.+)_{resolution}\.csv', file_path).group(1)
+    since = state.processed_until.get(city)
+    start = pd.Timestamp(since) - context if since is not None else None
+    with span('读取新观测', 城市=city):
+        text = read_since(file_path, start.to_pydatetime() if start is not None else None)
+        raw = pd.read_csv(io.StringIO(text), parse_dates=[TIME_COLUMN])
+    if start is not None:
+        raw = raw[raw[TIME_COLUMN] > start]
+    raw[CITY_COLUMN] = city
+    frames.append(downcast(raw))
+
+new_data = pd.DataFrame()
+if frames:
+    with span('质量检查与特征'):
+        data = screen(pd.concat(frames, ignore_index=True), resolution, quality_stats).clean
+        data = build_lag_features(data, resolution)
+    since = pd.to_datetime(data[CITY_COLUMN].astype(str).map(state.processed_until))
+    new_data = data[since.isna() | (data[TIME_COLUMN] > since)]
+    new_data = new_data.dropna(subset=features + ['AQI指数']).reset_index(drop=True)
+print(f"新观测: {len(new_data)} 条")
+
+# 2. 已部署模型在新观测上的误差，按日累加
+if len(new_data):
+    days = new_data[TIME_COLUMN].dt.strftime('%Y-%m-%d').to_numpy()
+    for model_path in sorted(glob.glob(os.path.join('models', '*_model.pkl'))):
+        name = os.path.basename(model_path)[:-len('_model.pkl')]
+        model = joblib.load(model_path)
+        input_df = new_data[features].copy()
+        if getattr(model, 'cities_', None):
+            input_df[CITY_COLUMN] = new_data[CITY_COLUMN].astype(str)
+        with span('模型预测', 模型=name, 行数=len(input_df)):
+            state.add_predictions(name, days, new_data['AQI指数'], model.predict(input_df))
+    state.add_features(days, new_data[features])
+
+    # 预测日志中的线上预测按 (城市, 目标时间) 与实际值关联，单独累计线上误差
+    logged = PredictionLog().query(new_data[TIME_COLUMN].min(), new_data[TIME_COLUMN].max(),
+                                   time_column='目标时间', columns=['目标时间', CITY_COLUMN, '预测值'])
+    if len(logged):
+        actual = new_data[[CITY_COLUMN, TIME_COLUMN, 'AQI指数']].astype({CITY_COLUMN: str})
+        joined = logged.rename(columns={'目标时间': TIME_COLUMN}).merge(actual, on=[CITY_COLUMN, TIME_COLUMN])
+        for name, group in joined.groupby('模型'):
+            state.add_predictions(f'{name}{ONLINE_SUFFIX}', group[TIME_COLUMN].dt.strftime('%Y-%m-%d').to_numpy(),
+                                  group['AQI指数'], group['预测值'])
+        print(f"预测日志: 关联到 {len(joined)} 条线上预测")
+
+    latest = new_data.groupby(new_data[CITY_COLUMN].astype(str))[TIME_COLUMN].max()
+    state.processed_until.update({city: str(ts) for city, ts in latest.items()})
+    state.prune(new_data[TIME_COLUMN].max())
+state.save()
+
+# 3. 滚动指标与特征漂移
+os.makedirs(MONITOR_DIR, exist_ok=True)
+metrics = state.rolling_metrics()
+drift = state.drift()
+metrics.to_csv(os.path.join(MONITOR_DIR, 'monitoring_report.csv'), index=False)
+drift.to_csv(os.path.join(MONITOR_DIR, 'drift_report.csv'), index=False)
+if len(metrics):
+    print("滚动窗口模型表现:")
+    print(metrics.to_string(index=False))
+print("特征漂移:")
+print(drift.to_string(index=False))
+
+# 4. 超过阈值时标记（或触发）重新训练
+reasons = retrain_reasons(metrics, drift) if len(metrics) else []
+flag_path = os.path.join(MONITOR_DIR, 'retrain.json')
+if reasons:
+    with open(flag_path, 'w', encoding='utf-8') as f:
+        json.dump({'reasons': reasons}, f, ensure_ascii=False, indent=1)
+    print("⚠️ 需要重新训练:")
+    for reason in reasons:
+        print(f"- {reason}")
+    if args.retrain:
+        from pipeline import STAGES, run_pipeline
+        retrain_stages = ('数据处理', '开始训练')
+        run_pipeline([stage for stage in STAGES if stage.name in retrain_stages], force=retrain_stages)
+else:
+    if os.path.exists(flag_path):
+        os.remove(flag_path)
+    print("✅ 模型表现与特征分布均在阈值内")
@@ -0,0 +1,218 @@
+# analysis_engine.py
+"""
+流式数据分析引擎
+
+对数据文件做一次分块遍历，同时得到：
+- 相关系数矩阵：按块计算每对列的均值与离差积矩阵，再用 Welford/Chan 公式合并，内存与行数无关；
+  与 DataFrame.corr() 一样按列对剔除缺失值（某列被屏蔽的单元格只影响包含该列的列对）；
+- 每个 (城市, 月) 的 AQI 分布：固定 1 个 AQI 单位宽度的直方图，分位数误差不超过 1；
+- AQI 时间序列：每块先用 LTTB 降采样再合并，最后整体再做一次 LTTB。
+分析开销随 城市数 × 月数 增长，而不随原始行数增长。
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from data_loader import iter_chunks
+
+AQI_MAX = 500
+
+
+class StreamingCovariance:
+    """
+    分块合并的按列对协方差（Chan 等人的并行 Welford 算法）
+
+    每对列 (i, j) 只使用两列都不缺失的行，分别保存行数 n[i, j]、列 i 在这些行上的均值
+    mean[i, j] 和离差平方和 m2[i, j]，以及离差积 comoment[i, j]，结果与 DataFrame.corr() 一致。
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.comoment = np.zeros((k, k))
+
+    def update(self, block):
+        block = np.asarray(block, dtype=np.float64)
+        valid = ~np.isnan(block)
+        if not valid.any():
+            return
+        # 块内先减去各列均值再求和，减小大数相消的误差
+        with np.errstate(invalid='ignore'):
+            shift = np.nan_to_num(np.nanmean(np.where(valid, block, np.nan), axis=0))
+        centered = np.where(valid, block - shift, 0.0)
+        weights = valid.astype(np.float64)
+
+        n_b = weights.T @ weights
+        sums = centered.T @ weights  # sums[i, j]: 列 i 在 (i, j) 均不缺失的行上的和
+        squares = (centered ** 2).T @ weights
+        products = centered.T @ centered
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_b = np.where(n_b > 0, sums / n_b, 0.0)
+        m2_b = squares - mean_b * sums
+        comoment_b = products - mean_b * sums.T
+        mean_b += shift[:, None]
+
+        n = self.n + n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(n > 0, self.n * n_b / n, 0.0)
+            delta = mean_b - self.mean
+            self.mean += np.where(n > 0, delta * n_b / n, 0.0)
+        self.m2 += m2_b + delta ** 2 * weight
+        self.comoment += comoment_b + delta * delta.T * weight
+        self.n = n
+
+    def covariance(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = np.where(self.n > 1, self.comoment / (self.n - 1), np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def correlation(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+class MonthlyHistogram:
+    """每个 (城市, 月) 一个 AQI 整数直方图，用于计算箱线图统计量"""
+
+    def __init__(self, max_value=AQI_MAX):
+        self.max_value = max_value
+        self.counts = {}
+
+    def update(self, cities, months, values):
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        bins = np.clip(np.rint(values[valid]), 0, self.max_value).astype(np.int64)
+        keys = pd.MultiIndex.from_arrays([np.asarray(cities)[valid], np.asarray(months)[valid]])
+        codes, uniques = pd.factorize(keys)
+        n_bins = self.max_value + 1
+        flat = np.bincount(codes * n_bins + bins, minlength=len(uniques) * n_bins)
+        for i, key in enumerate(uniques):
+            hist = flat[i * n_bins:(i + 1) * n_bins]
+            if key in self.counts:
+                self.counts[key] += hist
+            else:
+                self.counts[key] = hist.copy()
+
+    def box_stats(self, by_city=False):
+        """返回 matplotlib bxp 所需的统计量列表；by_city=False 时合并所有城市"""
+        merged = {}
+        for (city, month), hist in self.counts.items():
+            key = (city, month) if by_city else month
+            merged[key] = merged[key] + hist if key in merged else hist.copy()
+
+        stats = []
+        for key in sorted(merged):
+            hist = merged[key]
+            cdf = np.cumsum(hist) / hist.sum()
+            q1, med, q3 = (int(np.searchsorted(cdf, q)) for q in (0.25, 0.5, 0.75))
+            iqr = q3 - q1
+            present = np.flatnonzero(hist)
+            inside = present[(present >= q1 - 1.5 * iqr) & (present <= q3 + 1.5 * iqr)]
+            outliers = present[(present < q1 - 1.5 * iqr) | (present > q3 + 1.5 * iqr)]
+            stats.append({
+                'label': f'{key[0]}-{key[1]}' if by_city else str(key),
+                'q1': q1, 'med': med, 'q3': q3,
+                'whislo': int(inside.min()) if len(inside) else q1,
+                'whishi': int(inside.max()) if len(inside) else q3,
+                'fliers': outliers.astype(float),
+            })
+        return stats
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets 降采样，保留视觉上重要的峰谷点
+
+    x 需单调递增（数值类型），返回选中点的下标。
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+class StreamingSeries:
+    """分块 LTTB 降采样后的时间序列（每个城市一条）"""
+
+    def __init__(self, points_per_chunk=2000, n_out=2000):
+        self.points_per_chunk = points_per_chunk
+        self.n_out = n_out
+        self.parts = {}
+
+    def update(self, cities, timestamps, values):
+        frame = pd.DataFrame({'城市': np.asarray(cities), 't': np.asarray(timestamps, dtype=np.int64),
+                              'v': np.asarray(values, dtype=np.float64)}).dropna()
+        for city, part in frame.groupby('城市', sort=False):
+            part = part.sort_values('t')
+            idx = lttb(part['t'].to_numpy(), part['v'].to_numpy(), self.points_per_chunk)
+            self.parts.setdefault(city, []).append(part.iloc[idx][['t', 'v']])
+
+    def result(self):
+        """返回 {城市: DataFrame(日期, AQI指数)}"""
+        series = {}
+        for city, parts in self.parts.items():
+            part = pd.concat(parts).sort_values('t')
+            idx = lttb(part['t'].to_numpy(), part['v'].to_numpy(), self.n_out)
+            part = part.iloc[idx]
+            series[city] = pd.DataFrame({'日期': pd.to_datetime(part['t'].to_numpy()),
+                                         'AQI指数': part['v'].to_numpy()})
+        return series
+
+
+def correlation_columns(columns):
+    """相关性分析使用的列：原始观测值和 1 个时间单位前的滞后值，去掉冗余的更早滞后和日期分量"""
+    skip = {'年', '月', '日', '星期', '小时', '当天AQI排名'}
+    redundant_lag = re.compile(r'_([2-9]|\d{2,})(天|小时)前$')
+    return [c for c in columns if c not in skip and not redundant_lag.search(c)]
+
+
+def analyze(path, value_column='AQI指数', date_column='日期', city_column='城市',
+            chunk_rows=200_000, n_points=2000):
+    """
+    单次分块遍历数据文件
+
+    返回 dict: correlation（相关系数矩阵）、monthly（MonthlyHistogram）、
+    series（{城市: 降采样时间序列}）、n_rows
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    has_city = city_column in header
+    numeric = pd.read_csv(path, nrows=100).select_dtypes(include=[np.number]).columns
+    corr_columns = correlation_columns(numeric)
+
+    columns = [date_column] + corr_columns + ([city_column] if has_city else [])
+    covariance = StreamingCovariance(corr_columns)
+    monthly = MonthlyHistogram()
+    series = StreamingSeries(points_per_chunk=n_points, n_out=n_points)
+    n_rows = 0
+
+    for chunk in iter_chunks(path, columns, chunk_rows, categorical=(date_column, city_column)):
+        dates = pd.to_datetime(chunk[date_column])
+        cities = chunk[city_column].to_numpy() if has_city else np.full(len(chunk), '全部')
+        covariance.update(chunk[corr_columns].to_numpy())
+        monthly.update(cities, dates.dt.month.to_numpy(), chunk[value_column].to_numpy())
+        series.update(cities, dates.to_numpy().astype('datetime64[ns]').astype(np.int64),
+                      chunk[value_column].to_numpy())
+        n_rows += len(chunk)
+
+    return {'correlation': covariance.correlation(), 'monthly': monthly,
+            'series': series.result(), 'n_rows': n_rows}
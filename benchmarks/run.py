@@ -0,0 +1,209 @@
+# benchmarks/run.py
+"""
+离线基准测试
+
+覆盖数据采集的网页解析、数据处理（质量检查 + 滞后特征）、每个模型的训练和
+GUI 路径上的单行预测延迟，数据为 1×/10×/100× 规模的合成数据（见 synthetic.py），
+网页解析使用 fixtures/ 中保存的页面，全程不访问网络。
+
+每项记录耗时（多次运行取中位数）、当前和峰值 RSS，结果写为 JSON；
+指定 --baseline 时与基线比较，变慢超过阈值的项目使退出码为 1。
+
+用法:
+    python benchmarks/run.py                                  # 全部规模
+    python benchmarks/run.py --scales 1 10 --models 线性回归 随机森林
+    python benchmarks/run.py --output benchmarks/baseline.json  # 保存为基线
+    python benchmarks/run.py --baseline benchmarks/baseline.json --threshold 0.25
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.svm import SVR
+from sklearn.neighbors import KNeighborsRegressor
+
+from city_model import GlobalAQIModel, CITY_COLUMN
+from data_loader import memory_snapshot
+from data_quality import screen
+from ensemble import BlendedEnsemble
+from intervals import ConformalRegressor
+from timeseries_features import build_lag_features, feature_columns, lag_name
+from synthetic import synthetic_raw
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results.json')
+
+
+def benchmark_models():
+    """与 4.开始训练.py 相同配置的模型"""
+    models = {
+        '随机森林': RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1),
+        '梯度提升': GradientBoostingRegressor(n_estimators=100, random_state=42, learning_rate=0.1),
+        '线性回归': LinearRegression(),
+        '支持向量机': SVR(kernel='rbf', C=1.0, epsilon=0.1),
+        'K近邻': KNeighborsRegressor(n_neighbors=5, weights='distance', n_jobs=-1),
+    }
+    models['集成模型'] = BlendedEnsemble(list(models.items()))
+    return models
+
+
+def measure(func, repeats=None, min_time=0.2, max_repeats=50):
+    """
+    多次运行 func，返回 (耗时中位数秒, 各次耗时列表, 最后一次返回值)
+
+    未指定 repeats 时重复到累计 min_time 秒或 max_repeats 次为止。
+    """
+    times = []
+    result = None
+    while True:
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+        if repeats is not None:
+            if len(times) >= repeats:
+                break
+        elif sum(times) >= min_time or len(times) >= max_repeats:
+            break
+    return float(np.median(times)), times, result
+
+
+def parse_page(html):
+    """与 1.数据采集.py 相同的解析方式：第一行是表头"""
+    return pd.read_html(io.StringIO(html))[0].iloc[1:]
+
+
+def featurize(raw):
+    """与 2.数据处理.py 相同的处理：质量检查、日期分量、滞后特征；缺失特征与训练加载时一样用中位数填充"""
+    data = screen(raw.copy()).clean
+    data['年'] = data['日期'].dt.year
+    data['月'] = data['日期'].dt.month
+    data['日'] = data['日期'].dt.day
+    data['星期'] = data['日期'].dt.dayofweek
+    data = build_lag_features(data)
+    data = data.dropna(subset=['AQI指数', lag_name('AQI', 1)])
+    features = feature_columns()
+    data[features] = data[features].fillna(data[features].median())
+    return data
+
+
+class Recorder:
+    def __init__(self):
+        self.results = []
+
+    def add(self, name, scale, rows, seconds, times, **extra):
+        current, peak = memory_snapshot()
+        record = {'name': name, 'scale': scale, 'rows': rows, 'seconds': seconds,
+                  'repeats': len(times), 'min_seconds': float(min(times)),
+                  'rss_mb': current, 'peak_rss_mb': peak, **extra}
+        self.results.append(record)
+        print(f"{name:<24} {scale:>4}× {rows:>8} 行  {seconds * 1000:>10.2f} ms"
+              f"  RSS {current or 0:.0f} MB")
+
+
+def run(scales, model_names, predict_repeats=200):
+    recorder = Recorder()
+
+    # 网页解析（与规模无关，每个保存的页面单独计时）
+    for file_name in sorted(os.listdir(FIXTURE_DIR)):
+        if file_name.endswith('.html'):
+            with open(os.path.join(FIXTURE_DIR, file_name), encoding='utf-8') as f:
+                html = f.read()
+            seconds, times, table = measure(lambda: parse_page(html))
+            recorder.add(f'scrape_parse/{file_name}', 1, len(table), seconds, times)
+
+    features = feature_columns()
+    for scale in scales:
+        raw = synthetic_raw(scale)
+        seconds, times, dataset = measure(lambda: featurize(raw), repeats=3)
+        recorder.add('featurize', scale, len(raw), seconds, times)
+
+        X = dataset[features].astype(np.float32)
+        X[CITY_COLUMN] = dataset[CITY_COLUMN].astype(str).to_numpy()
+        y = dataset['AQI指数'].to_numpy()
+
+        for name, estimator in benchmark_models().items():
+            if model_names and name not in model_names:
+                continue
+            model = GlobalAQIModel(estimator)
+            seconds, times, _ = measure(lambda: model.fit(X, y), min_time=1.0, max_repeats=5)
+            recorder.add(f'fit/{name}', scale, len(X), seconds, times)
+
+            # GUI 路径：带预测区间的单行预测
+            model = ConformalRegressor.from_prefit(model, y, model.predict(X))
+            row = X.iloc[[0]]
+            seconds, times, _ = measure(lambda: model.predict_interval(row), repeats=predict_repeats)
+            recorder.add(f'predict_one/{name}', scale, 1, seconds, times,
+                         p95_seconds=float(np.percentile(times, 95)))
+    return recorder.results
+
+
+def compare(results, baseline, threshold, noise_floor=0.001):
+    """与基线比较，返回变慢超过阈值的项目列表"""
+    reference = {(r['name'], r['scale']): r for r in baseline['results']}
+    regressions = []
+    print(f"\n与基线比较（阈值 +{threshold:.0%}）:")
+    for record in results:
+        base = reference.get((record['name'], record['scale']))
+        if base is None:
+            continue
+        ratio = record['seconds'] / base['seconds'] if base['seconds'] else float('inf')
+        slower = ratio > 1 + threshold and record['seconds'] - base['seconds'] > noise_floor
+        mark = '❌' if slower else '✅'
+        print(f"{mark} {record['name']:<24} {record['scale']:>4}×  {base['seconds'] * 1000:>10.2f} → "
+              f"{record['seconds'] * 1000:>10.2f} ms  ({ratio:.2f}x)")
+        if slower:
+            regressions.append({**record, 'baseline_seconds': base['seconds'], 'ratio': ratio})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="空气质量预测系统离线基准测试")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100], help="合成数据规模倍数")
+    parser.add_argument('--models', nargs='*', default=[], help="只测试指定模型（默认全部）")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="结果 JSON 文件")
+    parser.add_argument('--baseline', default=None, help="基线结果 JSON 文件")
+    parser.add_argument('--threshold', type=float, default=0.25, help="允许的相对变慢比例")
+    args = parser.parse_args()
+
+    results = run(args.scales, args.models)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"\n结果已保存至 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 项性能回退")
+            sys.exit(1)
+        print("\n✅ 没有性能回退")
+
+
+if __name__ == "__main__":
+    main()
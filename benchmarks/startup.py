@@ -0,0 +1,130 @@
+# benchmarks/startup.py
+"""
+预测界面启动基准测试
+
+每次在新的子进程中（QT_QPA_PLATFORM=offscreen）导入 5.预测.py、创建并显示主窗口，
+记录三个时间（从子进程开始导入界面模块算起，多次运行取中位数）：
+- gui_import: 导入界面模块；
+- window_shown: 主窗口显示并处理完第一轮事件；
+- models_ready: 后台线程加载完全部模型。
+启动加载线程前导入了 numpy/pandas/sklearn 等重量级模块时视为回退，退出码为 1；
+指定 --baseline 时与基线比较（同 run.py）。
+
+用法:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --output benchmarks/startup_baseline.json  # 保存为基线
+    python benchmarks/startup.py --baseline benchmarks/startup_baseline.json --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_results.json')
+
+# 窗口显示前不应导入的模块
+HEAVY_MODULES = ('numpy', 'pandas', 'sklearn', 'scipy', 'joblib')
+
+PROBE = r'''
+import time
+start = time.perf_counter()
+import importlib.util, json, sys
+
+spec = importlib.util.spec_from_file_location('gui', '5.预测.py')
+gui = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gui)
+imported = time.perf_counter()
+
+app = gui.QApplication([])
+window = gui.AirQualityPredictionApp()
+window.show()
+# 第一轮事件中会启动后台加载线程，在此之前检查已导入的模块
+heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+app.processEvents()
+shown = time.perf_counter()
+
+deadline = shown + TIMEOUT
+while len(window.models) + len(window.load_errors) < len(window.model_names) and time.perf_counter() < deadline:
+    app.processEvents()
+    time.sleep(0.002)
+ready = time.perf_counter()
+print(json.dumps({'gui_import': imported - start, 'window_shown': shown - start, 'models_ready': ready - start,
+                  'models': len(window.models), 'heavy_before_shown': heavy}))
+window.close()
+'''
+
+
+def probe(timeout):
+    """在新进程中启动一次界面，返回各阶段耗时"""
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    env.pop('AQI_TRACE', None)
+    code = f'HEAVY_MODULES = {HEAVY_MODULES!r}\nTIMEOUT = {timeout!r}\n' + PROBE
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, encoding='utf-8', timeout=timeout + 60)
+    if result.returncode != 0:
+        raise RuntimeError(f"启动子进程失败:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(repeats, timeout):
+    runs = [probe(timeout) for _ in range(repeats)]
+    results = []
+    for name in ('gui_import', 'window_shown', 'models_ready'):
+        times = [r[name] for r in runs]
+        seconds = statistics.median(times)
+        results.append({'name': f'startup/{name}', 'scale': 1, 'rows': runs[-1]['models'], 'seconds': seconds,
+                        'repeats': len(times), 'min_seconds': min(times)})
+        print(f"{'startup/' + name:<24} {seconds * 1000:>10.1f} ms  (最小 {min(times) * 1000:.1f} ms)")
+    heavy = sorted({name for r in runs for name in r['heavy_before_shown']})
+    return results, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预测界面启动基准测试")
+    parser.add_argument('--repeats', type=int, default=5, help="启动次数")
+    parser.add_argument('--timeout', type=float, default=120, help="等待模型加载的最长秒数")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="结果 JSON 文件")
+    parser.add_argument('--baseline', default=None, help="基线结果 JSON 文件")
+    parser.add_argument('--threshold', type=float, default=0.25, help="允许的相对变慢比例")
+    args = parser.parse_args()
+
+    results, heavy = run(args.repeats, args.timeout)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'heavy_before_shown': heavy,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"\n结果已保存至 {args.output}")
+
+    failed = False
+    if heavy:
+        print(f"\n❌ 窗口显示前导入了重量级模块: {', '.join(heavy)}")
+        failed = True
+    if args.baseline:
+        from run import compare
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, noise_floor=0.05)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 项启动时间回退")
+            failed = True
+    if failed:
+        sys.exit(1)
+    print("\n✅ 启动性能正常")
+
+
+if __name__ == "__main__":
+    main()
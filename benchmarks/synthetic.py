@@ -0,0 +1,94 @@
+# benchmarks/synthetic.py
+"""
+基准测试用的合成数据
+
+- 原始观测：每个城市一年逐日数据，带季节性和自相关噪声，AQI 由各污染物分指数计算，
+  能通过数据质量检查；scale 倍规模即 scale 个城市（1× 与单城市的 dataset.csv 相当）；
+- 网页表格：与 tianqihoubao 月度页面结构相同的 HTML，用于离线测试 pd.read_html 解析。
+
+直接运行时重新生成 fixtures/aqi_month.html（固定随机种子，结果可复现）:
+    python benchmarks/synthetic.py
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from data_quality import recompute_aqi
+from timeseries_features import CITY_COLUMN, RESOLUTIONS, TIME_COLUMN
+
+BASE_DAYS = 366
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'aqi_month.html')
+
+RAW_COLUMNS = ['日期', '质量等级', 'AQI指数', '当天AQI排名', 'PM2.5', 'PM10', 'So2', 'No2', 'Co', 'O3']
+LEVELS = ['优', '良', '轻度污染', '中度污染', '重度污染', '严重污染']
+
+# 各污染物的 (基准浓度, 季节振幅比例, 噪声标准差, 下限, 上限, 小数位)
+PROFILES = {
+    'PM2.5': (45, 0.5, 15, 3, 400, 0),
+    'PM10': (70, 0.4, 20, 5, 550, 0),
+    'So2': (10, 0.3, 3, 1, 100, 0),
+    'No2': (35, 0.3, 10, 5, 200, 0),
+    'Co': (0.8, 0.3, 0.2, 0.2, 5, 2),
+    'O3': (90, -0.5, 25, 5, 250, 0),
+}
+
+
+def _smooth_noise(rng, n, scale, span=5):
+    """指数平滑的正态噪声，模拟相邻时刻的自相关"""
+    noise = pd.Series(rng.normal(0, 1, n)).ewm(span=span).mean().to_numpy()
+    return noise / max(noise.std(), 1e-9) * scale
+
+
+def synthetic_raw(scale=1, seed=0, resolution='day'):
+    """scale 个城市、每个城市一年的原始观测，与 空气质量-{城市}_{分辨率}.csv 的列相同，另加 城市 列"""
+    rng = np.random.default_rng(seed)
+    periods = BASE_DAYS * (24 if resolution == 'hour' else 1)
+    times = pd.date_range('2024-01-01', periods=periods, freq=RESOLUTIONS[resolution]['freq'])
+    season = np.cos(2 * np.pi * (times.dayofyear.to_numpy() - 15) / 366)
+
+    frames = []
+    for i in range(scale):
+        level = rng.uniform(0.6, 1.6)
+        frame = pd.DataFrame({TIME_COLUMN: times})
+        for column, (base, amplitude, noise, low, high, decimals) in PROFILES.items():
+            values = level * (base * (1 + amplitude * season) + _smooth_noise(rng, periods, noise)
+                              + rng.normal(0, noise / 2, periods))
+            frame[column] = np.clip(values, low, high).round(decimals)
+        frame['AQI指数'] = np.round(recompute_aqi(frame, resolution))
+        frame['质量等级'] = pd.cut(frame['AQI指数'], bins=[-np.inf, 50, 100, 150, 200, 300, np.inf],
+                               labels=LEVELS).astype(str)
+        frame['当天AQI排名'] = rng.integers(1, 370, periods)
+        frame[CITY_COLUMN] = f'city{i:03d}'
+        frames.append(frame)
+    raw = pd.concat(frames, ignore_index=True)
+    return raw[RAW_COLUMNS + [CITY_COLUMN]]
+
+
+def month_html(raw, city=None, month=1):
+    """把一个城市一个月的观测渲染成网页表格（表头也是普通 td 行，与原网站一致）"""
+    city = city or raw[CITY_COLUMN].iloc[0]
+    part = raw[(raw[CITY_COLUMN] == city) & (raw[TIME_COLUMN].dt.month == month)]
+    rows = ['<tr>' + ''.join(f'<td>{name}</td>' for name in RAW_COLUMNS) + '</tr>']
+    for record in part[RAW_COLUMNS].itertuples(index=False):
+        cells = [record[0].strftime('%Y-%m-%d')] + [str(value) for value in record[1:]]
+        rows.append('<tr>' + ''.join(f'<td>{cell}</td>' for cell in cells) + '</tr>')
+    return ('<html><head><meta charset="utf-8"></head><body><div class="api_month_list">'
+            '<table>\n' + '\n'.join(rows) + '\n</table></div></body></html>\n')
+
+
+def write_fixture(path=FIXTURE_PATH, seed=0):
+    """生成网页解析基准使用的月度页面"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as f:
+        f.write(month_html(synthetic_raw(1, seed=seed)))
+    return path
+
+
+if __name__ == "__main__":
+    print(f"已生成 {write_fixture()}")
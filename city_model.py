@@ -0,0 +1,165 @@
+# city_model.py
+"""
+多城市全局模型
+
+所有城市的数据共用一个模型，城市身份以平滑后的目标编码作为额外特征，
+并为每个城市保存一个残差偏移量做校准。模型保存为单个 pkl 文件，
+内存与训练开销只随数据行数增长，而不随 城市数 × 模型数 增长。
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+
+from data_loader import empty_matrix, fit_in_chunks, take_rows
+from feature_spec import CITY_COLUMN
+
+CITY_FEATURE = '城市编码'
+
+
+class CityTargetEncoder:
+    """城市目标编码：城市AQI均值向全局均值收缩"""
+
+    def __init__(self, smoothing=10.0):
+        self.smoothing = smoothing
+
+    def _encode(self, sums, counts, prior):
+        return (sums + self.smoothing * prior) / (counts + self.smoothing)
+
+    def fit(self, cities, y):
+        codes, self.categories_ = pd.factorize(np.asarray(cities), sort=True)
+        y = np.asarray(y, dtype=np.float64)
+        self.prior_ = float(y.mean())
+        sums = np.bincount(codes, weights=y, minlength=len(self.categories_))
+        counts = np.bincount(codes, minlength=len(self.categories_))
+        self.encoding_ = self._encode(sums, counts, self.prior_)
+        return self
+
+    def fit_transform_oof(self, cities, y, n_splits=5, random_state=42):
+        """拟合编码并返回训练行的折外编码，避免目标泄漏"""
+        self.fit(cities, y)
+        codes = self.codes(cities)
+        y = np.asarray(y, dtype=np.float64)
+        n_cities = len(self.categories_)
+        total_sums = np.bincount(codes, weights=y, minlength=n_cities)
+        total_counts = np.bincount(codes, minlength=n_cities)
+
+        folds = np.random.RandomState(random_state).randint(0, n_splits, size=len(codes))
+        encoded = np.empty(len(codes), dtype=np.float64)
+        for k in range(n_splits):
+            mask = folds == k
+            fold_sums = np.bincount(codes[mask], weights=y[mask], minlength=n_cities)
+            fold_counts = np.bincount(codes[mask], minlength=n_cities)
+            fold_prior = (y.sum() - y[mask].sum()) / max(len(y) - mask.sum(), 1)
+            table = self._encode(total_sums - fold_sums, total_counts - fold_counts, fold_prior)
+            encoded[mask] = table[codes[mask]]
+        return encoded
+
+    def codes(self, cities):
+        """城市名 -> 编码表下标，未知城市为 -1"""
+        return pd.Index(self.categories_).get_indexer(np.asarray(cities))
+
+    def transform(self, cities):
+        idx = self.codes(cities)
+        return np.where(idx >= 0, self.encoding_[np.maximum(idx, 0)], self.prior_)
+
+
+class GlobalAQIModel(BaseEstimator, RegressorMixin):
+    """
+    全局AQI模型包装器
+
+    输入为特征 DataFrame，可选包含 '城市' 列；不含城市列时退化为普通模型。
+    未见过的城市使用全局均值编码且不做校准。
+    指定 cache_dir 时，训练用的设计矩阵和校准子集逐块写入该目录下的临时内存映射文件，
+    不在内存中另存一份特征矩阵（预测时的设计矩阵仍在内存中）。
+    """
+
+    def __init__(self, estimator, smoothing=10.0, calibration_size=0.2, refit=True, random_state=42,
+                 cache_dir=None):
+        self.estimator = estimator
+        self.smoothing = smoothing
+        self.calibration_size = calibration_size
+        self.refit = refit
+        self.random_state = random_state
+        self.cache_dir = cache_dir
+
+    def _split_input(self, X):
+        if isinstance(X, pd.DataFrame) and CITY_COLUMN in X.columns:
+            return X.drop(columns=[CITY_COLUMN]), X[CITY_COLUMN].astype(str).to_numpy()
+        return X, None
+
+    def _design_matrix(self, features, city_encoding, cache_dir=None):
+        matrix = np.asarray(features, dtype=np.float32)
+        if city_encoding is None:
+            return matrix
+        # 预分配 float32 缓冲区（指定 cache_dir 时为内存映射）逐段写入，避免 column_stack 再复制一份特征矩阵
+        design = empty_matrix((matrix.shape[0], matrix.shape[1] + 1), cache_dir)
+        design[:, :-1] = matrix
+        design[:, -1] = city_encoding
+        return design
+
+    def fit(self, X, y):
+        features, cities = self._split_input(X)
+        y = np.asarray(y, dtype=np.float64)
+        self.feature_names_ = [str(c) for c in getattr(features, 'columns', range(np.shape(features)[1]))]
+        self.design_feature_names_ = self.feature_names_ + ([CITY_FEATURE] if cities is not None else [])
+
+        if cities is None:
+            self.encoder_ = None
+            self.cities_ = []
+            self.offsets_ = np.zeros(0)
+            design = self._design_matrix(features, None)
+            self.design_means_ = design.mean(axis=0)
+            self.estimator_ = fit_in_chunks(clone(self.estimator), design, y)
+            return self
+
+        # 1. 城市目标编码（训练行使用折外编码）
+        self.encoder_ = CityTargetEncoder(self.smoothing)
+        encoded = self.encoder_.fit_transform_oof(cities, y, random_state=self.random_state)
+        self.cities_ = [str(c) for c in self.encoder_.categories_]
+        design = self._design_matrix(features, encoded, self.cache_dir)
+        self.design_means_ = design.mean(axis=0)
+
+        # 2. 留出部分数据计算各城市残差偏移量
+        rng = np.random.RandomState(self.random_state)
+        holdout = rng.rand(len(y)) < self.calibration_size
+        if holdout.any() and (~holdout).any():
+            core = fit_in_chunks(clone(self.estimator), take_rows(design, ~holdout, self.cache_dir), y[~holdout])
+            residuals = y[holdout] - core.predict(take_rows(design, holdout, self.cache_dir))
+            codes = self.encoder_.codes(cities[holdout])
+            n_cities = len(self.cities_)
+            sums = np.bincount(codes, weights=residuals, minlength=n_cities)
+            counts = np.bincount(codes, minlength=n_cities)
+            self.offsets_ = sums / (counts + self.smoothing)
+        else:
+            core = None
+            self.offsets_ = np.zeros(len(self.cities_))
+
+        # 3. 在全部数据上重新训练
+        if self.refit or core is None:
+            self.estimator_ = fit_in_chunks(clone(self.estimator), design, y)
+        else:
+            self.estimator_ = core
+        return self
+
+    def transform(self, X):
+        """返回送入基础模型的设计矩阵（含城市编码列）"""
+        features, cities = self._split_input(X)
+        if self.encoder_ is None:
+            return self._design_matrix(features, None)
+        if cities is None:
+            encoded = np.full(len(features), self.encoder_.prior_)
+        else:
+            encoded = self.encoder_.transform(cities)
+        return self._design_matrix(features, encoded)
+
+    def city_offsets(self, X):
+        """各行对应的城市校准偏移量"""
+        features, cities = self._split_input(X)
+        if self.encoder_ is None or cities is None:
+            return np.zeros(len(features))
+        idx = self.encoder_.codes(cities)
+        return np.where(idx >= 0, self.offsets_[np.maximum(idx, 0)], 0.0)
+
+    def predict(self, X):
+        return self.estimator_.predict(self.transform(X)) + self.city_offsets(X)
@@ -0,0 +1,221 @@
+# data_loader.py
+"""
+分块、内存有界的训练数据加载
+
+数据文件（CSV 或 Parquet）按块读取为 float32，直接写入磁盘上的内存映射矩阵，
+不会把整张表读入 pandas。源文件未变化时直接复用已生成的内存映射缓存。
+训练/测试子集和模型的设计矩阵也可以逐块写入临时文件的内存映射（take_rows、empty_matrix）。
+支持 partial_fit 的模型可以逐块增量训练，其余模型使用内存映射矩阵。
+"""
+
+import json
+import os
+import sys
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TrainingMatrix = namedtuple('TrainingMatrix', ['X', 'y', 'cities', 'missing_counts', 'max_times'])
+
+STAGE_MEMORY = []
+_overall_peak = 0.0
+
+
+def memory_snapshot():
+    """返回 (当前RSS, 峰值RSS)，单位 MB，无法获取时为 None"""
+    current = peak = None
+    if os.path.exists('/proc/self/statm'):
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位为字节，Linux 为 KB
+        peak = max_rss / 2 ** 20 if sys.platform == 'darwin' else max_rss / 2 ** 10
+    if current is None or peak is None:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            current = info.rss / 2 ** 20 if current is None else current
+            peak = getattr(info, 'peak_wset', info.rss) / 2 ** 20 if peak is None else peak
+        except ImportError:
+            pass
+    return current, peak
+
+
+def reset_peak():
+    """把峰值 RSS 重置为当前 RSS（只有 Linux 支持），成功返回 True"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def log_stage_memory(stage):
+    """
+    记录并打印某个阶段结束时的内存占用
+
+    阶段峰值为上一次记录之后的峰值 RSS（需要 reset_peak，不支持的平台为 None），
+    峰值增量为该阶段使进程峰值 RSS 增加的量，两者都只反映本阶段，而不是进程启动以来的最大值。
+    """
+    global _overall_peak
+    current, peak = memory_snapshot()
+    increase = None
+    if peak is not None:
+        increase = max(peak - _overall_peak, 0.0)
+        _overall_peak = max(_overall_peak, peak)
+    stage_peak = peak if peak is not None and reset_peak() else None
+    STAGE_MEMORY.append({'阶段': stage, '当前RSS(MB)': current, '阶段峰值RSS(MB)': stage_peak,
+                         '峰值增量(MB)': increase})
+    instrumentation.memory(stage, current, peak)
+    if peak is not None:
+        stage_text = f", 阶段峰值 {stage_peak:.1f} MB" if stage_peak is not None else ""
+        print(f"[内存] {stage}: 当前 {current or 0:.1f} MB{stage_text}, 峰值增量 {increase:.1f} MB")
+
+
+def iter_chunks(path, columns, chunk_rows=100_000, categorical=()):
+    """
+    按块读取指定列，数值列为 float32，categorical 中的列按字符串读取
+    """
+    dtypes = {c: (str if c in categorical else np.float32) for c in columns}
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("读取 Parquet 文件需要安装 pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=list(columns)):
+            yield batch.to_pandas().astype(dtypes)
+    else:
+        yield from pd.read_csv(path, usecols=list(columns), dtype=dtypes, chunksize=chunk_rows)
+
+
+def _source_signature(path, features, target, city_column, time_column=None):
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'features': list(features), 'target': target, 'city_column': city_column, 'time_column': time_column}
+
+
+def load_training_matrix(path, features, target, city_column=None, time_column=None,
+                         cache_dir='cache', chunk_rows=100_000):
+    """
+    把数据文件转换为内存映射的 float32 特征矩阵和目标向量
+
+    缺失值用列中位数就地填充。返回 TrainingMatrix(X, y, cities, missing_counts, max_times)，
+    cities 为 pd.Categorical（没有城市列时为 None，城市缺失的行为 NaN）；max_times 为 {城市: 最晚时间}
+    （指定 time_column 时在同一次分块遍历中得到，没有城市列时键为 '全部'，否则为空字典）。
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    x_path = os.path.join(cache_dir, 'train_X.f32')
+    y_path = os.path.join(cache_dir, 'train_y.f32')
+    city_path = os.path.join(cache_dir, 'train_city.i32')
+    meta_path = os.path.join(cache_dir, 'train_matrix.json')
+    signature = _source_signature(path, features, target, city_column, time_column)
+
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('source') != signature:
+            meta = None
+
+    if meta is None:
+        # 逐块追加写入，内存只保留当前块
+        columns = (list(features) + [target] + ([city_column] if city_column else [])
+                   + ([time_column] if time_column else []))
+        categories = {}
+        max_times = {}
+        n_rows = 0
+        missing = np.zeros(len(features) + 1, dtype=np.int64)
+        with open(x_path, 'wb') as fx, open(y_path, 'wb') as fy, open(city_path, 'wb') as fc:
+            for chunk in iter_chunks(path, columns, chunk_rows, categorical=(city_column, time_column)):
+                block = chunk[list(features) + [target]].to_numpy(dtype=np.float32)
+                missing += np.isnan(block).sum(axis=0)
+                np.ascontiguousarray(block[:, :-1]).tofile(fx)
+                block[:, -1].tofile(fy)
+                if city_column:
+                    codes, uniques = pd.factorize(chunk[city_column])
+                    mapping = np.array([categories.setdefault(c, len(categories)) for c in uniques], dtype=np.int32)
+                    # 城市缺失的行（factorize 编码为 -1）保持 -1，读取时为未知城市（NaN）
+                    city_codes = np.full(len(codes), -1, dtype=np.int32)
+                    known = codes >= 0
+                    city_codes[known] = mapping[codes[known]]
+                    city_codes.tofile(fc)
+                if time_column:
+                    times = pd.to_datetime(chunk[time_column])
+                    latest = times.groupby(chunk[city_column]).max() if city_column else {'全部': times.max()}
+                    for city, ts in latest.items():
+                        if pd.notna(ts) and (city not in max_times or ts > max_times[city]):
+                            max_times[city] = ts
+                n_rows += len(block)
+
+        meta = {'source': signature, 'n_rows': n_rows, 'categories': list(categories),
+                'missing_counts': missing.tolist(), 'max_times': {c: str(ts) for c, ts in max_times.items()}}
+        if missing.any():
+            _fill_missing_with_median(x_path, y_path, n_rows, len(features), missing)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    n_rows = meta['n_rows']
+    X = np.memmap(x_path, dtype=np.float32, mode='r', shape=(n_rows, len(features)))
+    y = np.memmap(y_path, dtype=np.float32, mode='r', shape=(n_rows,))
+    cities = None
+    if city_column:
+        codes = np.memmap(city_path, dtype=np.int32, mode='r', shape=(n_rows,))
+        cities = pd.Categorical.from_codes(codes, categories=meta['categories'])
+    missing_counts = dict(zip(list(features) + [target], meta['missing_counts']))
+    max_times = {city: pd.Timestamp(ts) for city, ts in meta['max_times'].items()}
+    return TrainingMatrix(X, y, cities, missing_counts, max_times)
+
+
+def _fill_missing_with_median(x_path, y_path, n_rows, n_features, missing):
+    X = np.memmap(x_path, dtype=np.float32, mode='r+', shape=(n_rows, n_features))
+    y = np.memmap(y_path, dtype=np.float32, mode='r+', shape=(n_rows,))
+    for j in np.flatnonzero(missing[:-1]):
+        column = X[:, j]
+        column[np.isnan(column)] = np.nanmedian(column)
+    if missing[-1]:
+        y[np.isnan(y)] = np.nanmedian(y)
+    X.flush()
+    y.flush()
+
+
+def empty_matrix(shape, cache_dir=None):
+    """
+    float32 矩阵：指定 cache_dir 时为该目录下匿名临时文件的内存映射（不再引用后自动删除），
+    否则在内存中分配
+    """
+    if cache_dir is None:
+        return np.empty(shape, dtype=np.float32)
+    os.makedirs(cache_dir, exist_ok=True)
+    with tempfile.TemporaryFile(dir=cache_dir) as f:
+        return np.memmap(f, dtype=np.float32, mode='w+', shape=shape)
+
+
+def take_rows(X, rows, cache_dir=None, chunk_rows=100_000):
+    """按行下标或布尔掩码取 X 的子集，逐块写入 empty_matrix，不在内存中整体复制"""
+    rows = np.asarray(rows)
+    if rows.dtype == bool:
+        rows = np.flatnonzero(rows)
+    out = empty_matrix((len(rows),) + X.shape[1:], cache_dir)
+    for start in range(0, len(rows), chunk_rows):
+        out[start:start + chunk_rows] = X[rows[start:start + chunk_rows]]
+    return out
+
+
+def fit_in_chunks(estimator, X, y, chunk_rows=100_000):
+    """支持 partial_fit 的模型逐块增量训练，其余模型直接在完整（内存映射）矩阵上训练"""
+    if not hasattr(estimator, 'partial_fit'):
+        return estimator.fit(X, y)
+    for start in range(0, len(y), chunk_rows):
+        estimator.partial_fit(X[start:start + chunk_rows], y[start:start + chunk_rows])
+    return estimator
@@ -0,0 +1,243 @@
+# data_quality.py
+"""
+数据质量与异常筛查
+
+在构建特征之前，对所有城市的原始观测一次性做向量化规则检查：
+- 硬性规则：超出物理范围、零值、长时间恒定值（传感器卡死）、AQI 与由各污染物浓度
+  重新计算的分指数不一致；命中的单元格置为缺失值，只有 AQI（预测目标）无效的行被隔离；
+- 软性规则（只记入报告）：相邻时刻变化过快、按城市计算的稳健 Z 分数异常、IQR 异常。
+按城市的中位数、MAD、四分位数和量化步长可以由 city_statistics 预先计算并保存，
+监控时只检查少量新观测也能使用训练数据上的统计量。
+"""
+
+import json
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from timeseries_features import CITY_COLUMN, POLLUTANTS, TIME_COLUMN
+
+QualityResult = namedtuple('QualityResult', ['clean', 'quarantine', 'report'])
+
+HARD_RULES = ('超出范围', '零值', '恒定值', 'AQI不一致')
+SOFT_RULES = ('变化过快', '稳健Z分数异常', 'IQR异常')
+
+# 物理上可能的取值范围（超出即视为错误数据，例如 CO 单位误用 μg/m³）
+RANGES = {
+    'AQI指数': (0, 500),
+    'PM2.5': (0, 1000),
+    'PM10': (0, 3000),
+    'So2': (0, 3000),
+    'No2': (0, 1500),
+    'O3': (0, 1500),
+    'Co': (0, 150),
+}
+
+# 相邻两个时刻允许的最大变化量
+MAX_STEP = {
+    'AQI指数': 300,
+    'PM2.5': 300,
+    'PM10': 500,
+    'So2': 200,
+    'No2': 200,
+    'O3': 300,
+    'Co': 10,
+}
+
+# 连续相同取值达到该长度视为传感器卡死
+FLATLINE_RUN = {'day': 5, 'hour': 8}
+# 取值不足量化步长（该城市该列相邻观测的最小非零差）的这么多倍时不判断恒定值：
+# 例如一位小数的 Co 或个位数的 So2，正常数据也经常连续几天相同
+FLATLINE_MIN_LEVELS = 20
+
+STATISTICS = ('中位数', 'MAD', '下四分位数', '上四分位数', '量化步长')
+STATISTICS_PATH = 'quality_statistics.json'
+
+ROBUST_Z_LIMIT = 5.0
+IQR_FACTOR = 3.0
+AQI_TOLERANCE = 10
+
+# HJ 633-2012 空气质量分指数分段（浓度断点，IAQI 断点）
+IAQI_LEVELS = [0, 50, 100, 150, 200, 300, 400, 500]
+BREAKPOINTS = {
+    'day': {
+        'PM2.5': [0, 35, 75, 115, 150, 250, 350, 500],
+        'PM10': [0, 50, 150, 250, 350, 420, 500, 600],
+        'So2': [0, 50, 150, 475, 800, 1600, 2100, 2620],
+        'No2': [0, 40, 80, 180, 280, 565, 750, 940],
+        'Co': [0, 2, 4, 14, 24, 36, 48, 60],
+        'O3': [0, 100, 160, 215, 265, 800],  # 8小时滑动平均
+    },
+    'hour': {
+        'PM2.5': [0, 35, 75, 115, 150, 250, 350, 500],
+        'PM10': [0, 50, 150, 250, 350, 420, 500, 600],
+        'So2': [0, 150, 500, 650, 800],
+        'No2': [0, 100, 200, 700, 1200, 2340, 3090, 3840],
+        'Co': [0, 5, 10, 35, 60, 90, 120, 150],
+        'O3': [0, 160, 200, 300, 400, 800, 1000, 1200],
+    },
+}
+
+
+def recompute_aqi(data, resolution='day'):
+    """由各污染物浓度按分段线性插值计算分指数，取最大值作为 AQI（缺失的分指数跳过，全部缺失时为 NaN）"""
+    iaqi = []
+    for column, breakpoints in BREAKPOINTS[resolution].items():
+        if column in data.columns:
+            levels = IAQI_LEVELS[:len(breakpoints)]
+            concentration = data[column].to_numpy(dtype=np.float64)
+            iaqi.append(np.where(np.isnan(concentration), np.nan, np.interp(concentration, breakpoints, levels)))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # 整行缺失
+        return np.nanmax(np.column_stack(iaqi), axis=1)
+
+
+def _run_lengths(same):
+    """same[i] 表示第 i 行与上一行取值相同，返回每行所在连续段的长度"""
+    run_id = np.cumsum(~same)
+    return np.bincount(run_id)[run_id]
+
+
+def _prepare(data):
+    """按 (城市, 时间) 排序，返回排序后的数据、检查的列、数值矩阵、城市编码、城市名、同城标记和上一时刻的值"""
+    data = data.sort_values([CITY_COLUMN, TIME_COLUMN], ignore_index=True)
+    columns = [column for column, _ in POLLUTANTS if column in data.columns]
+    values = data[columns].to_numpy(dtype=np.float64)
+    city_codes, cities = pd.factorize(data[CITY_COLUMN].astype(str))
+    same_city = np.r_[False, city_codes[1:] == city_codes[:-1]][:, None]
+    previous = np.vstack([np.full((1, len(columns)), np.nan), values[:-1]])
+    return data, columns, values, city_codes, list(cities), same_city, previous
+
+
+def _group_statistics(values, columns, city_codes, cities, same_city, previous):
+    frame = pd.DataFrame(values, columns=columns)
+    grouped = frame.groupby(city_codes)
+    median = grouped.median()
+    quartiles = grouped.quantile([0.25, 0.75])
+    mad = (frame - median.to_numpy()[city_codes]).abs().groupby(city_codes).median()
+    with np.errstate(invalid='ignore'):
+        steps = np.abs(values - previous)
+        steps[~(same_city & (steps > 0))] = np.nan
+    step = pd.DataFrame(steps, columns=columns).groupby(city_codes).min()
+    stats = {'中位数': median, 'MAD': mad, '下四分位数': quartiles.xs(0.25, level=1),
+             '上四分位数': quartiles.xs(0.75, level=1), '量化步长': step}
+    for table in stats.values():
+        table.index = [cities[code] for code in table.index]
+    return stats
+
+
+def city_statistics(data):
+    """按城市计算各列的中位数、MAD、四分位数和量化步长，返回 {统计量: DataFrame(城市 × 列)}"""
+    _, columns, values, city_codes, cities, same_city, previous = _prepare(data)
+    return _group_statistics(values, columns, city_codes, cities, same_city, previous)
+
+
+def statistics_to_dict(stats):
+    return {name: table.to_dict('index') for name, table in stats.items()}
+
+
+def statistics_from_dict(stats):
+    return {name: pd.DataFrame.from_dict(table, orient='index') for name, table in stats.items()}
+
+
+def save_statistics(stats, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(statistics_to_dict(stats), f, ensure_ascii=False, indent=1)
+
+
+def load_statistics(path):
+    with open(path, encoding='utf-8') as f:
+        return statistics_from_dict(json.load(f))
+
+
+def screen(data, resolution='day', stats=None):
+    """
+    对原始观测做质量检查
+
+    stats 为 city_statistics 的结果；不指定时由 data 本身计算（只有少量新观测时应传入训练数据的统计量）。
+    返回 QualityResult(clean, quarantine, report)：
+    clean 为 AQI 有效的行，其他列中命中硬性规则的单元格置为缺失值；
+    quarantine 为 AQI 无效而被隔离的行（附 问题 列）；
+    report 为各城市、各规则、各列命中的行数，类型为 隔离（AQI 列）、屏蔽（其他列）或 警告（软性规则）。
+    """
+    data, columns, values, city_codes, cities, same_city, previous = _prepare(data)
+    present = ~np.isnan(values)
+
+    lower = np.array([RANGES[c][0] for c in columns])
+    upper = np.array([RANGES[c][1] for c in columns])
+    max_step = np.array([MAX_STEP[c] for c in columns])
+
+    # 按城市的统计量，一次分组计算后按城市编码广播回各行（没有统计量的城市为缺失值，相应规则不触发）
+    if stats is None:
+        stats = _group_statistics(values, columns, city_codes, cities, same_city, previous)
+    median, mad, q1, q3, step = (stats[name].reindex(index=cities, columns=columns)
+                                 .to_numpy(dtype=np.float64)[city_codes] for name in STATISTICS)
+    iqr = q3 - q1
+
+    same_as_previous = (values == previous) & same_city
+    flatline = np.column_stack([_run_lengths(same_as_previous[:, j]) for j in range(len(columns))])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        robust_z = np.abs(0.6745 * (values - median) / mad)
+        # 整列从未变化过（没有量化步长）本身就是卡死的迹象
+        levels = np.where(np.isnan(step), np.inf, np.abs(values) / step)
+        flags = {
+            '超出范围': present & ((values < lower) | (values > upper)),
+            '零值': present & (values == 0),
+            '恒定值': present & (flatline >= FLATLINE_RUN[resolution]) & (levels >= FLATLINE_MIN_LEVELS),
+            '变化过快': same_city & (np.abs(values - previous) > max_step),
+            '稳健Z分数异常': present & (mad > 0) & (robust_z > ROBUST_Z_LIMIT),
+            'IQR异常': present & ((values < q1 - IQR_FACTOR * iqr) | (values > q3 + IQR_FACTOR * iqr)),
+        }
+
+    # AQI 与重新计算的分指数是否一致（只作用于 AQI 列）；
+    # 先屏蔽命中其他硬性规则的单元格再计算，单个错误浓度不会连带判定 AQI 无效
+    aqi_flag = np.zeros_like(present)
+    if 'AQI指数' in columns:
+        cell_invalid = flags['超出范围'] | flags['零值'] | flags['恒定值']
+        recomputed = recompute_aqi(pd.DataFrame(np.where(cell_invalid, np.nan, values), columns=columns),
+                                   resolution)
+        aqi = values[:, columns.index('AQI指数')]
+        with np.errstate(invalid='ignore'):
+            mismatch = np.abs(aqi - recomputed) > AQI_TOLERANCE + 0.1 * recomputed
+        aqi_flag[:, columns.index('AQI指数')] = mismatch & present[:, columns.index('AQI指数')]
+    flags['AQI不一致'] = aqi_flag
+
+    # 命中硬性规则的单元格置为缺失值；AQI 无效的行隔离
+    invalid = np.zeros_like(present)
+    problems = np.full(len(data), '', dtype=object)
+    for rule in HARD_RULES:
+        invalid |= flags[rule]
+        for j, column in enumerate(columns):
+            hit = flags[rule][:, j]
+            problems[hit] = problems[hit] + f'{rule}({column});'
+    hard = invalid[:, columns.index('AQI指数')] if 'AQI指数' in columns else np.zeros(len(data), dtype=bool)
+
+    quarantine = data[hard].copy()
+    quarantine['问题'] = problems[hard]
+    clean = data[~hard].reset_index(drop=True)
+    for j, column in enumerate(columns):
+        masked = invalid[~hard, j]
+        if masked.any():
+            clean[column] = clean[column].mask(masked)
+
+    # 质量报告：各城市 × 规则 × 列 的命中行数
+    cities = data[CITY_COLUMN].astype(str).to_numpy()
+    report = []
+    for rule, mask in flags.items():
+        counts = pd.DataFrame(mask, columns=columns).groupby(cities).sum()
+        counts = counts.stack().rename('行数').reset_index()
+        counts.columns = [CITY_COLUMN, '列', '行数']
+        counts.insert(1, '规则', rule)
+        if rule in HARD_RULES:
+            counts['类型'] = np.where(counts['列'] == 'AQI指数', '隔离', '屏蔽')
+        else:
+            counts['类型'] = '警告'
+        report.append(counts[counts['行数'] > 0])
+    report = pd.concat(report, ignore_index=True)
+    totals = pd.Series(cities).value_counts()
+    report['比例'] = report['行数'] / report[CITY_COLUMN].map(totals)
+
+    return QualityResult(clean, quarantine, report)
@@ -0,0 +1,105 @@
+# ensemble.py
+"""
+基础模型加权集成
+
+用折外(out-of-fold)预测学习非负融合权重(nnls)或堆叠元模型(stack)，
+权重为 0 的基础模型被剪除，不参与最终训练和预测。
+预测时各基础模型在同一个输入数组上计算：行数较多时由一个常驻线程池并行，
+行数较少（如界面中的单条预测）时顺序计算，避免线程调度开销。
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.optimize import nnls
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import KFold, cross_val_predict
+
+# 行数少于该值时各基础模型顺序预测
+PARALLEL_MIN_ROWS = 1000
+
+
+class BlendedEnsemble(BaseEstimator, RegressorMixin):
+    """
+    参数:
+        estimators: [(名称, 模型), ...] 基础模型列表
+        method: 'nnls' 非负最小二乘融合权重；'stack' 非负线性元模型（带截距）
+        cv: 生成折外预测的折数
+        n_jobs: 预测时的并行线程数，默认等于保留的基础模型数
+    """
+
+    def __init__(self, estimators, method='nnls', cv=5, tol=1e-6, n_jobs=None, random_state=42):
+        self.estimators = estimators
+        self.method = method
+        self.cv = cv
+        self.tol = tol
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float32)
+        y = np.asarray(y, dtype=np.float64)
+        folds = KFold(n_splits=self.cv, shuffle=True, random_state=self.random_state)
+
+        # 1. 折外预测
+        oof = np.column_stack([
+            cross_val_predict(clone(est), X, y, cv=folds)
+            for _, est in self.estimators
+        ])
+        self.oof_rmse_ = dict(zip(
+            [name for name, _ in self.estimators],
+            np.sqrt(((oof - y[:, None]) ** 2).mean(axis=0))
+        ))
+
+        # 2. 学习融合权重
+        if self.method == 'nnls':
+            weights, _ = nnls(oof, y)
+            intercept = 0.0
+        elif self.method == 'stack':
+            meta = LinearRegression(positive=True).fit(oof, y)
+            weights, intercept = meta.coef_, float(meta.intercept_)
+        else:
+            raise ValueError(f"不支持的集成方法: {self.method}")
+
+        # 3. 剪除权重为 0 的模型，只训练保留的模型
+        keep = weights > self.tol
+        if not keep.any():
+            raise ValueError("所有基础模型的融合权重均为 0")
+        self.weights_ = weights[keep]
+        self.intercept_ = intercept
+        self.estimators_ = [
+            (name, clone(est).fit(X, y))
+            for (name, est), kept in zip(self.estimators, keep) if kept
+        ]
+        return self
+
+    def blend_weights(self):
+        """返回 {模型名称: 权重}，被剪除的模型权重为 0"""
+        kept = dict(zip([name for name, _ in self.estimators_], self.weights_))
+        return {name: float(kept.get(name, 0.0)) for name, _ in self.estimators}
+
+    def __getstate__(self):
+        # 线程池不能序列化，反序列化后首次并行预测时重新创建
+        state = super().__getstate__()
+        state.pop('_pool', None)
+        return state
+
+    def _get_pool(self):
+        """首次并行预测时创建线程池，之后复用"""
+        if getattr(self, '_pool', None) is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.n_jobs or len(self.estimators_),
+                                            thread_name_prefix='ensemble-predict')
+        return self._pool
+
+    def predict_members(self, X):
+        """各保留模型在同一输入数组上预测（行数较多时并行），返回 (n_samples, n_members)"""
+        X = np.asarray(X, dtype=np.float32)
+        if len(self.estimators_) == 1 or len(X) < PARALLEL_MIN_ROWS:
+            columns = [est.predict(X) for _, est in self.estimators_]
+        else:
+            columns = list(self._get_pool().map(lambda item: item[1].predict(X), self.estimators_))
+        return np.column_stack(columns)
+
+    def predict(self, X):
+        return self.predict_members(X) @ self.weights_ + self.intercept_
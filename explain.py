@@ -0,0 +1,185 @@
+# explain.py
+"""
+预测结果的特征贡献解释
+
+树模型（随机森林、梯度提升）按 Saabas 路径分解：样本沿决策路径每经过一次分裂，
+节点均值的变化量记到该分裂特征上，所有特征贡献之和加基准值严格等于预测值。
+树在首次使用时展平成连续数组（预编译），之后所有样本、所有树在同一组
+数组运算中按层推进，足以在每次界面预测和批量预测中实时计算。
+线性回归的贡献为 系数 × (特征值 - 训练均值)；集成模型按融合权重合并各成员的贡献。
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+
+from city_model import GlobalAQIModel
+from ensemble import BlendedEnsemble
+from intervals import ConformalRegressor
+
+CALIBRATION_FEATURE = '城市校准'
+
+
+class CompiledTrees:
+    """把多棵 sklearn 回归树展平为连续数组"""
+
+    def __init__(self, trees, scale, base_value):
+        lefts, rights, features, thresholds, values, roots = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            lefts.append(np.where(left >= 0, left + offset, -1))
+            rights.append(np.where(right >= 0, right + offset, -1))
+            features.append(np.maximum(tree.feature, 0).astype(np.int64))
+            thresholds.append(tree.threshold)
+            values.append(tree.value[:, 0, 0] * scale)
+            roots.append(offset)
+            offset += tree.node_count
+
+        self.left = np.concatenate(lefts)
+        self.right = np.concatenate(rights)
+        self.feature = np.concatenate(features)
+        self.threshold = np.concatenate(thresholds)
+        self.value = np.concatenate(values)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.base_value = base_value + self.value[self.roots].sum()
+
+    def contributions(self, X, chunk_size=2048):
+        """返回 (基准值, 贡献矩阵 n_samples × n_features)"""
+        X = np.asarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        contrib = np.zeros((n_samples, n_features))
+        n_trees = len(self.roots)
+
+        for start in range(0, n_samples, chunk_size):
+            block = X[start:start + chunk_size]
+            n_block = len(block)
+            sample = np.repeat(np.arange(n_block), n_trees)
+            node = np.tile(self.roots, n_block)
+            flat = np.zeros(n_block * n_features)
+
+            while True:
+                active = self.left[node] >= 0
+                if not active.any():
+                    break
+                sample, node = sample[active], node[active]
+                feature = self.feature[node]
+                go_left = block[sample, feature] <= self.threshold[node]
+                child = np.where(go_left, self.left[node], self.right[node])
+                flat += np.bincount(sample * n_features + feature,
+                                    weights=self.value[child] - self.value[node],
+                                    minlength=n_block * n_features)
+                node = child
+
+            contrib[start:start + n_block] = flat.reshape(n_block, n_features)
+        return np.full(n_samples, self.base_value), contrib
+
+
+class LinearContributions:
+    """线性模型：贡献 = 系数 × (特征值 - 训练均值)，与树模型同样以训练均值为基准"""
+
+    def __init__(self, model, means=None):
+        self.coef = np.ravel(model.coef_)
+        self.means = np.zeros_like(self.coef) if means is None else np.asarray(means, dtype=np.float64)
+        self.base_value = float(np.ravel(model.intercept_)[0]) + float(self.coef @ self.means)
+
+    def contributions(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return np.full(len(X), self.base_value), (X - self.means) * self.coef
+
+
+class _WeightedContributions:
+    def __init__(self, members, weights, intercept):
+        self.members = members
+        self.weights = weights
+        self.intercept = intercept
+
+    def contributions(self, X):
+        base = np.full(len(X), self.intercept)
+        contrib = 0.0
+        for member, weight in zip(self.members, self.weights):
+            member_base, member_contrib = member.contributions(X)
+            base = base + weight * member_base
+            contrib = contrib + weight * member_contrib
+        return base, contrib
+
+
+def _compile(estimator, means=None):
+    """为单个基础模型生成贡献计算器，不支持的模型返回 None"""
+    if isinstance(estimator, RandomForestRegressor):
+        trees = [e.tree_ for e in estimator.estimators_]
+        return CompiledTrees(trees, 1.0 / len(trees), 0.0)
+    if isinstance(estimator, GradientBoostingRegressor):
+        trees = [e.tree_ for e in estimator.estimators_[:, 0]]
+        if estimator.init_ == 'zero':
+            init = 0.0
+        else:
+            init = float(np.ravel(estimator.init_.predict(np.zeros((1, estimator.n_features_in_))))[0])
+        return CompiledTrees(trees, estimator.learning_rate, init)
+    if isinstance(estimator, DecisionTreeRegressor):
+        return CompiledTrees([estimator.tree_], 1.0, 0.0)
+    if isinstance(estimator, LinearRegression):
+        return LinearContributions(estimator, means)
+    if isinstance(estimator, BlendedEnsemble):
+        members = [_compile(member, means) for _, member in estimator.estimators_]
+        if any(m is None for m in members):
+            return None
+        return _WeightedContributions(members, estimator.weights_, estimator.intercept_)
+    return None
+
+
+def _unwrap(model):
+    """剥离区间与全局模型包装，返回 (全局模型或None, 基础模型)"""
+    if isinstance(model, ConformalRegressor):
+        model = model.estimator_
+    if isinstance(model, GlobalAQIModel):
+        return model, model.estimator_
+    return None, model
+
+
+def _design_means(global_model):
+    return getattr(global_model, 'design_means_', None)
+
+
+def supports_explanation(model):
+    global_model, estimator = _unwrap(model)
+    return _compile(estimator, _design_means(global_model)) is not None
+
+
+class ModelExplainer:
+    """
+    预编译一个已训练模型的解释器
+
+    explain(X) 返回 (基准值 Series, 贡献 DataFrame)，
+    每行满足 基准值 + 贡献之和 = 点预测值。
+    """
+
+    def __init__(self, model):
+        self.global_model, estimator = _unwrap(model)
+        self.compiled = _compile(estimator, _design_means(self.global_model))
+        if self.compiled is None:
+            raise ValueError(f"不支持解释的模型类型: {type(estimator).__name__}")
+
+    def explain(self, X):
+        if self.global_model is not None:
+            design = self.global_model.transform(X)
+            names = list(self.global_model.design_feature_names_)
+        else:
+            design = np.asarray(X, dtype=np.float32)
+            names = [str(c) for c in getattr(X, 'columns', range(design.shape[1]))]
+
+        base, contrib = self.compiled.contributions(design)
+        index = getattr(X, 'index', None)
+        contrib = pd.DataFrame(contrib, columns=names, index=index)
+        if self.global_model is not None and self.global_model.encoder_ is not None:
+            contrib[CALIBRATION_FEATURE] = self.global_model.city_offsets(X)
+        return pd.Series(base, index=index, name='基准值'), contrib
+
+
+def global_importance(model, X):
+    """平均绝对贡献作为全局特征重要性"""
+    _, contrib = ModelExplainer(model).explain(X)
+    return contrib.abs().mean().sort_values(ascending=False)
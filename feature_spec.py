@@ -0,0 +1,51 @@
+# feature_spec.py
+"""
+时间分辨率、列名和特征名定义
+
+只依赖标准库，界面程序启动时可以在不导入 numpy/pandas 的情况下构建输入项。
+通过环境变量 AQI_RESOLUTION 选择 'day'（默认，逐日）或 'hour'（逐小时）。
+"""
+
+import os
+
+RESOLUTION = os.environ.get('AQI_RESOLUTION', 'day')
+
+RESOLUTIONS = {
+    'day': {'freq': 'D', 'unit': '天', 'period': '前一天'},
+    'hour': {'freq': 'h', 'unit': '小时', 'period': '前一小时'},
+}
+
+# (原始列名, 滞后特征前缀)
+POLLUTANTS = [
+    ('AQI指数', 'AQI'),
+    ('PM2.5', 'PM2.5'),
+    ('PM10', 'PM10'),
+    ('So2', 'So2'),
+    ('No2', 'No2'),
+    ('O3', 'O3'),
+    ('Co', 'Co'),
+]
+LAGS = (1, 2)
+
+TIME_COLUMN = '日期'
+CITY_COLUMN = '城市'
+STATION_COLUMN = '站点'
+
+
+def resolution_config(resolution):
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"不支持的时间分辨率: {resolution}（可选: {', '.join(RESOLUTIONS)}）")
+    return RESOLUTIONS[resolution]
+
+
+def lag_name(prefix, n, resolution=RESOLUTION):
+    return f"{prefix}_{n}{resolution_config(resolution)['unit']}前"
+
+
+def feature_columns(resolution=RESOLUTION):
+    """模型输入特征：各污染物上一个时间单位的值"""
+    return [lag_name(prefix, 1, resolution) for _, prefix in POLLUTANTS]
+
+
+def raw_file_pattern(resolution=RESOLUTION):
+    return f'空气质量-*_{resolution}.csv'
@@ -0,0 +1,199 @@
+# instrumentation.py
+"""
+轻量级阶段计时与性能剖析
+
+通过环境变量开启，不需要修改脚本，三个开关互相独立：
+- AQI_TRACE=目录        记录各阶段耗时（span）、计数器和内存快照，进程退出时在该目录写入
+                        trace-event 文件（chrome://tracing 或 Perfetto 打开，可看时间线/火焰图）
+                        和按阶段汇总的 JSON；
+- AQI_PROFILE=名称模式   对名称匹配（fnmatch，逗号分隔，* 表示全部）的阶段开启 cProfile，
+                        每次运行写一个 .prof 文件（可用 snakeviz 等工具查看）到 AQI_TRACE 目录
+                        （未设置时为当前目录）下的 profiles/；同一时刻只剖析一个阶段；
+- AQI_TRACEMALLOC=1     用 tracemalloc 记录每个阶段新分配内存的峰值（嵌套阶段以内层为准），
+                        设置了 AQI_TRACE 时写入追踪文件，否则在阶段结束时打印。
+三者都未设置时 span() 返回同一个空上下文管理器，其余函数直接返回，开销可以忽略。
+"""
+
+import atexit
+import fnmatch
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+TRACE_DIR = os.environ.get('AQI_TRACE', '')
+PROFILE_PATTERNS = [p.strip() for p in os.environ.get('AQI_PROFILE', '').split(',') if p.strip()]
+TRACEMALLOC = os.environ.get('AQI_TRACEMALLOC', '') not in ('', '0')
+ENABLED = bool(TRACE_DIR)
+# 性能剖析和 tracemalloc 不依赖 AQI_TRACE，任一开启时 span() 都需要真正进入阶段
+SPANS_ENABLED = ENABLED or bool(PROFILE_PATTERNS) or TRACEMALLOC
+
+_PID = os.getpid()
+_START_NS = time.perf_counter_ns()
+_events = []
+_counters = {}
+_memory = []
+_thread_names = {}
+_lock = threading.Lock()
+_profiling = False
+_profile_seq = 0
+
+
+def _now_us():
+    return (time.perf_counter_ns() - _START_NS) / 1000
+
+
+def _tid():
+    tid = threading.get_ident()
+    if tid not in _thread_names:
+        _thread_names[tid] = threading.current_thread().name
+    return tid
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.profiler = None
+
+    def set(self, **attrs):
+        """补充阶段属性（例如处理的行数）"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        global _profiling
+        if PROFILE_PATTERNS and not _profiling and any(fnmatch.fnmatch(self.name, p) for p in PROFILE_PATTERNS):
+            import cProfile
+            _profiling = True
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if TRACEMALLOC:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.malloc_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = _now_us()
+        if TRACEMALLOC:
+            import tracemalloc
+            self.attrs['新分配峰值(MB)'] = round((tracemalloc.get_traced_memory()[1] - self.malloc_start) / 2 ** 20, 3)
+            if not ENABLED:
+                print(f"[性能] {self.name}: 新分配峰值 {self.attrs['新分配峰值(MB)']} MB")
+        if self.profiler is not None:
+            self._dump_profile()
+        if not ENABLED:
+            return False
+        if exc_type is not None:
+            self.attrs['错误'] = repr(exc)
+        _events.append({'name': self.name, 'ph': 'X', 'ts': self.start, 'dur': end - self.start,
+                        'pid': _PID, 'tid': _tid(), 'args': self.attrs})
+        return False
+
+    def _dump_profile(self):
+        global _profiling, _profile_seq
+        self.profiler.disable()
+        _profiling = False
+        _profile_seq += 1
+        directory = os.path.join(TRACE_DIR or '.', 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        safe_name = re.sub(r'[^\w.-]+', '_', self.name)
+        path = os.path.join(directory, f'{_script_name()}-{_PID}-{_profile_seq:03d}-{safe_name}.prof')
+        self.profiler.dump_stats(path)
+        self.attrs['profile'] = path
+        if not ENABLED:
+            print(f"[性能] 剖析文件已保存: {path}")
+
+
+def span(name, **attrs):
+    """
+    记录一个阶段的耗时：with span('训练', 模型=name): ...
+
+    追踪、剖析和 tracemalloc 都未开启时返回空上下文管理器。
+    """
+    if not SPANS_ENABLED:
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def count(name, value=1):
+    """累加计数器"""
+    if not ENABLED:
+        return
+    with _lock:
+        total = _counters[name] = _counters.get(name, 0) + value
+    _events.append({'name': name, 'ph': 'C', 'ts': _now_us(), 'pid': _PID, 'tid': _tid(), 'args': {name: total}})
+
+
+def memory(label, current, peak):
+    """记录一次内存快照（当前与峰值 RSS，单位 MB，由调用方测得，如 data_loader.memory_snapshot()）"""
+    if not ENABLED:
+        return
+    ts = _now_us()
+    _memory.append({'标签': label, '时间(ms)': ts / 1000, '当前RSS(MB)': current, '峰值RSS(MB)': peak})
+    _events.append({'name': '内存', 'ph': 'C', 'ts': ts, 'pid': _PID, 'tid': _tid(),
+                    'args': {'当前RSS(MB)': current or 0, '峰值RSS(MB)': peak or 0}})
+
+
+def _script_name():
+    return os.path.splitext(os.path.basename(sys.argv[0] if sys.argv and sys.argv[0] else 'python'))[0] or 'python'
+
+
+def summary():
+    """按阶段名称汇总：次数、总耗时、平均耗时、最大耗时（毫秒）"""
+    stages = {}
+    for event in _events:
+        if event['ph'] != 'X':
+            continue
+        stats = stages.setdefault(event['name'], {'次数': 0, '总耗时(ms)': 0.0, '最大耗时(ms)': 0.0})
+        stats['次数'] += 1
+        stats['总耗时(ms)'] += event['dur'] / 1000
+        stats['最大耗时(ms)'] = max(stats['最大耗时(ms)'], event['dur'] / 1000)
+    for stats in stages.values():
+        stats['平均耗时(ms)'] = stats['总耗时(ms)'] / stats['次数']
+    return {'脚本': _script_name(), '总耗时(ms)': _now_us() / 1000, '阶段': stages,
+            '计数器': dict(_counters), '内存': list(_memory)}
+
+
+def export(directory=None):
+    """写出 trace-event 文件和汇总 JSON，返回两个文件路径"""
+    directory = directory or TRACE_DIR
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{_script_name()}-{time.strftime('%Y%m%d-%H%M%S')}-{_PID}")
+
+    # 整个进程作为最外层阶段
+    whole = {'name': _script_name(), 'ph': 'X', 'ts': 0, 'dur': _now_us(), 'pid': _PID, 'tid': _tid(), 'args': {}}
+    metadata = [{'name': 'process_name', 'ph': 'M', 'pid': _PID, 'args': {'name': _script_name()}}]
+    metadata += [{'name': 'thread_name', 'ph': 'M', 'pid': _PID, 'tid': tid, 'args': {'name': name}}
+                 for tid, name in _thread_names.items()]
+    with open(base + '.trace.json', 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': metadata + [whole] + _events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+    with open(base + '.summary.json', 'w', encoding='utf-8') as f:
+        json.dump(summary(), f, ensure_ascii=False, indent=1)
+    print(f"[性能] 追踪文件已保存: {base}.trace.json")
+    return base + '.trace.json', base + '.summary.json'
+
+
+if ENABLED:
+    atexit.register(export)
@@ -0,0 +1,154 @@
+# latest_data.py
+"""
+原始观测文件的最新一行缓存
+
+数据采集脚本按时间顺序向 空气质量-{城市}_{分辨率}.csv 追加写入，最新的观测总在文件末尾：
+- 城市 → 文件的索引由文件名建立，查询不到的城市时重新扫描一次目录；
+- 每个文件缓存 (大小, 修改时间, 最后一行)，文件未变化时只需一次 stat；
+- 文件变化时只读取表头和文件末尾的一小块，耗时与历史长度无关；
+- read_since 从文件末尾向前读取某个时间之后的所有行，耗时只与新增行数有关。
+只依赖标准库，界面启动时即可使用。
+"""
+
+import csv
+import glob
+import os
+import re
+from collections import namedtuple
+from datetime import datetime
+
+from feature_spec import POLLUTANTS, RESOLUTION, TIME_COLUMN, lag_name, raw_file_pattern
+
+TAIL_BYTES = 4096
+
+# time 为文件中的时间文本，values 为 {列名: 数值}（空值为 None）
+LatestRow = namedtuple('LatestRow', ['city', 'time', 'values', 'path'])
+
+
+def read_last_line(path, block=TAIL_BYTES):
+    """从文件末尾向前读取，返回最后一个非空行（文件只有表头时返回表头）"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        size = block
+        while True:
+            start = max(end - size, 0)
+            f.seek(start)
+            lines = f.read(end - start).splitlines()
+            while lines and not lines[-1].strip():
+                lines.pop()
+            # 读到的块中至少有一个完整行，或已经读到文件开头
+            if len(lines) > 1 or start == 0:
+                return lines[-1].decode('utf-8-sig') if lines else ''
+            size *= 2
+
+
+def _line_time(line, index):
+    fields = next(csv.reader([line]), [])
+    try:
+        return datetime.fromisoformat(fields[index])
+    except (IndexError, ValueError):
+        return None
+
+
+def read_since(path, since, time_column=TIME_COLUMN, block=64 * 1024):
+    """
+    返回表头和时间不早于 since 的数据行组成的 CSV 文本（另含其前一行，调用方再按时间精确过滤）
+
+    从文件末尾向前按块读取，遇到早于 since 的行即停止；since 为 None 时读取整个文件。
+    """
+    with open(path, 'rb') as f:
+        header_line = f.readline()
+        header_end = f.tell()
+        if since is None:
+            return (header_line + f.read()).decode('utf-8-sig')
+        header = next(csv.reader([header_line.decode('utf-8-sig')]), [])
+        index = header.index(time_column)
+
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        carry = b''
+        lines = []  # 倒序
+        while position > header_end:
+            start = max(position - block, header_end)
+            f.seek(start)
+            parts = (f.read(position - start) + carry).split(b'\n')
+            # 块首可能是不完整的行，留到下一块拼接
+            carry = parts.pop(0) if start > header_end else b''
+            position = start
+            reached = False
+            for raw in reversed(parts):
+                line = raw.decode('utf-8').rstrip('\r')
+                if not line.strip():
+                    continue
+                lines.append(line)
+                time = _line_time(line, index)
+                if time is not None and time < since:
+                    reached = True
+                    break
+            if reached:
+                break
+    return header_line.decode('utf-8-sig').rstrip('\r\n') + '\n' + ''.join(line + '\n' for line in reversed(lines))
+
+
+def read_header(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader([f.readline()]), [])
+
+
+def _number(text):
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+class LatestRowCache:
+    """按城市查询最新一行观测"""
+
+    def __init__(self, resolution=RESOLUTION):
+        self.resolution = resolution
+        self.paths = {}
+        self.entries = {}  # 文件路径 -> (大小, 修改时间, LatestRow)
+
+    def _scan(self):
+        pattern = re.compile(rf'空气质量-(.+)_{self.resolution}\.csv$')
+        self.paths = {pattern.search(os.path.basename(path)).group(1): path
+                      for path in glob.glob(raw_file_pattern(self.resolution))}
+
+    def cities(self):
+        self._scan()
+        return sorted(self.paths)
+
+    def latest(self, city):
+        """城市最新的一行观测，没有数据文件或文件中没有观测时返回 None"""
+        if city not in self.paths:
+            self._scan()
+        path = self.paths.get(city)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.paths.pop(city, None)
+            self.entries.pop(path, None)
+            return None
+
+        entry = self.entries.get(path)
+        if entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            return entry[2]
+
+        header = read_header(path)
+        fields = next(csv.reader([read_last_line(path)]), [])
+        row = None
+        if fields and fields != header and TIME_COLUMN in header:
+            record = dict(zip(header, fields))
+            values = {column: _number(record.get(column, '')) for column, _ in POLLUTANTS}
+            row = LatestRow(city, record[TIME_COLUMN], values, path)
+        self.entries[path] = (stat.st_size, stat.st_mtime_ns, row)
+        return row
+
+
+def feature_inputs(row, resolution=RESOLUTION):
+    """最新观测 → 预测下一个时间单位所需的 1 个时间单位前的输入特征"""
+    return {lag_name(prefix, 1, resolution): row.values.get(column) for column, prefix in POLLUTANTS}
@@ -0,0 +1,216 @@
+# monitoring.py
+"""
+已部署模型的漂移与性能监控
+
+- 训练时把每个输入特征的分位数分箱和训练集直方图、各模型测试集 RMSE、
+  每个城市训练数据的截止时间和数据质量统计量写入 models/training_profile.json；
+- 监控任务只读取截止时间之后新采集的观测（文件末尾），按训练数据的质量统计量检查，
+  用已部署模型预测并与实际值比较，
+  按 (模型, 日) 累加 样本数/绝对误差和/平方误差和/±30命中数，按日累加特征直方图，
+  状态保存在 monitoring/state.json，每次运行只读取新增的行；
+- 滚动窗口内的 MAE/RMSE/准确率由每日累加量合并得到，特征漂移用 PSI 和 KS 统计量衡量，
+  超过阈值时给出重新训练的原因。
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_quality import statistics_from_dict, statistics_to_dict
+
+PROFILE_PATH = os.path.join('models', 'training_profile.json')
+MONITOR_DIR = 'monitoring'
+STATE_PATH = os.path.join(MONITOR_DIR, 'state.json')
+
+N_BINS = 10
+WINDOW_DAYS = 30
+MIN_SAMPLES = 7
+PSI_LIMIT = 0.25
+KS_LIMIT = 0.2
+RMSE_RATIO_LIMIT = 1.3
+
+# 由预测日志关联得到的线上误差，以 模型名+后缀 单独累计
+ONLINE_SUFFIX = '(线上)'
+
+
+def feature_edges(values, n_bins=N_BINS):
+    """按训练数据分位数确定的内部分箱边界"""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    edges = np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1])
+    return np.unique(edges)
+
+
+def histogram(values, edges):
+    """落入各分箱的样本数，两端分箱分别向负无穷和正无穷延伸"""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    return np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+
+
+def psi(expected, actual, eps=1e-4):
+    """群体稳定性指数"""
+    p = np.maximum(np.asarray(expected, dtype=np.float64) / max(np.sum(expected), 1), eps)
+    q = np.maximum(np.asarray(actual, dtype=np.float64) / max(np.sum(actual), 1), eps)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks_statistic(expected, actual):
+    """两个分箱直方图累积分布之差的最大值（分箱上的 KS 统计量）"""
+    p = np.cumsum(expected) / max(np.sum(expected), 1)
+    q = np.cumsum(actual) / max(np.sum(actual), 1)
+    return float(np.max(np.abs(p - q)))
+
+
+def build_profile(X, features, trained_until, baseline_rmse, resolution, quality_stats=None):
+    """
+    训练数据画像：特征分箱与直方图、各城市数据截止时间、各模型测试集 RMSE，
+    以及数据处理时保存的按城市质量统计量（监控新观测时据此做质量检查）
+    """
+    histograms = {}
+    for feature in features:
+        edges = feature_edges(X[feature])
+        histograms[feature] = {'edges': edges.tolist(), 'counts': histogram(X[feature], edges).tolist()}
+    return {
+        'created_at': time.time(),
+        'resolution': resolution,
+        'features': list(features),
+        'histograms': histograms,
+        'trained_until': {city: str(ts) for city, ts in trained_until.items()},
+        'baseline_rmse': {name: float(v) for name, v in baseline_rmse.items() if pd.notna(v)},
+        'quality_statistics': statistics_to_dict(quality_stats) if quality_stats is not None else None,
+    }
+
+
+def profile_statistics(profile):
+    """画像中保存的按城市质量统计量（旧版本画像中没有时返回 None）"""
+    stats = profile.get('quality_statistics')
+    return statistics_from_dict(stats) if stats else None
+
+
+def save_profile(profile, path=PROFILE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=1)
+
+
+def load_profile(path=PROFILE_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"训练画像 {path} 不存在，请先运行模型训练脚本")
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class MonitorState:
+    """
+    监控的增量状态
+
+    errors: {模型: {日期: [样本数, 绝对误差和, 平方误差和, ±30命中数]}}
+    features: {日期: {特征: 各分箱计数}}
+    processed_until: {城市: 已处理到的时间}
+    模型重新训练后（画像的 created_at 变化）状态自动清空。
+    """
+
+    def __init__(self, profile, path=STATE_PATH):
+        self.profile = profile
+        self.path = path
+        state = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+        if state.get('profile_created_at') != profile['created_at']:
+            state = {}
+        self.errors = state.get('errors', {})
+        self.features = state.get('features', {})
+        self.processed_until = state.get('processed_until', dict(profile['trained_until']))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        state = {'profile_created_at': self.profile['created_at'], 'errors': self.errors,
+                 'features': self.features, 'processed_until': self.processed_until}
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+
+    def add_predictions(self, model_name, days, y_true, y_pred):
+        """按日累加一个模型的误差统计量"""
+        error = np.asarray(y_pred, dtype=np.float64) - np.asarray(y_true, dtype=np.float64)
+        frame = pd.DataFrame({'日': days, 'n': 1, 'abs': np.abs(error), 'sq': error ** 2,
+                              'hit': (np.abs(error) <= 30).astype(int)})
+        daily = self.errors.setdefault(model_name, {})
+        for day, row in frame.groupby('日')[['n', 'abs', 'sq', 'hit']].sum().iterrows():
+            old = daily.get(day, [0, 0.0, 0.0, 0])
+            daily[day] = [old[0] + int(row['n']), old[1] + row['abs'],
+                          old[2] + row['sq'], old[3] + int(row['hit'])]
+
+    def add_features(self, days, X):
+        """按日累加输入特征的直方图"""
+        days = np.asarray(days)
+        for day in np.unique(days):
+            mask = days == day
+            counts = self.features.setdefault(day, {})
+            for feature, hist in self.profile['histograms'].items():
+                new = histogram(X.loc[mask, feature], np.asarray(hist['edges']))
+                counts[feature] = (np.asarray(counts.get(feature, 0)) + new).tolist()
+
+    def prune(self, latest_day, window_days=WINDOW_DAYS):
+        """丢弃滚动窗口之外的每日累加量"""
+        cutoff = str((pd.Timestamp(latest_day) - pd.Timedelta(days=window_days - 1)).date())
+        for daily in self.errors.values():
+            for day in [d for d in daily if d < cutoff]:
+                del daily[day]
+        for day in [d for d in self.features if d < cutoff]:
+            del self.features[day]
+
+    def rolling_metrics(self):
+        """滚动窗口内各模型的 MAE、RMSE 和 ±30 准确率"""
+        rows = []
+        for model_name, daily in self.errors.items():
+            n, abs_sum, sq_sum, hits = np.sum(list(daily.values()), axis=0) if daily else (0, 0, 0, 0)
+            baseline = self.profile['baseline_rmse'].get(model_name.removesuffix(ONLINE_SUFFIX))
+            rmse = np.sqrt(sq_sum / n) if n else np.nan
+            rows.append({
+                '模型': model_name,
+                '样本数': int(n),
+                '天数': len(daily),
+                'MAE': abs_sum / n if n else np.nan,
+                'RMSE': rmse,
+                '准确率(±30)': hits / n if n else np.nan,
+                '训练时RMSE': baseline,
+                'RMSE比值': rmse / baseline if baseline and n else np.nan,
+            })
+        return pd.DataFrame(rows)
+
+    def drift(self):
+        """滚动窗口内各特征相对训练分布的 PSI 和 KS 统计量"""
+        rows = []
+        for feature, hist in self.profile['histograms'].items():
+            recent = np.sum([day[feature] for day in self.features.values() if feature in day], axis=0)
+            n = int(np.sum(recent)) if np.ndim(recent) else 0
+            rows.append({
+                '特征': feature,
+                '样本数': n,
+                'PSI': psi(hist['counts'], recent) if n else np.nan,
+                'KS': ks_statistic(hist['counts'], recent) if n else np.nan,
+            })
+        return pd.DataFrame(rows)
+
+
+def retrain_reasons(metrics, drift):
+    """根据阈值判断是否需要重新训练，返回原因列表（为空表示不需要）"""
+    reasons = []
+    enough = metrics[metrics['样本数'] >= MIN_SAMPLES]
+    for _, row in enough[enough['RMSE比值'] > RMSE_RATIO_LIMIT].iterrows():
+        reasons.append(f"{row['模型']}: 滚动RMSE {row['RMSE']:.2f} 超过训练时的 {RMSE_RATIO_LIMIT} 倍")
+    drifted = drift[drift['样本数'] >= MIN_SAMPLES]
+    # 样本较少时 PSI 和 KS 本身偏大：PSI 阈值加上无漂移时的期望值 (分箱数-1)/样本数，
+    # KS 阈值取 KS_LIMIT 与 5% 显著性临界值中的较大者
+    psi_limit = PSI_LIMIT + (N_BINS - 1) / drifted['样本数'].clip(lower=1)
+    for _, row in drifted[drifted['PSI'] > psi_limit].iterrows():
+        reasons.append(f"{row['特征']}: PSI {row['PSI']:.3f} 超过阈值")
+    ks_limit = np.maximum(KS_LIMIT, 1.36 / np.sqrt(drifted['样本数'].clip(lower=1)))
+    for _, row in drifted[drifted['KS'] > ks_limit].iterrows():
+        reasons.append(f"{row['特征']}: KS {row['KS']:.3f} 超过阈值")
+    return reasons
@@ -0,0 +1,216 @@
+# pipeline.py
+"""
+流水线运行器
+
+把 1.数据采集 → 2.数据处理 → 3.数据分析 / 4.开始训练 声明为带输入输出的阶段。
+每个阶段的指纹由 代码（脚本及其导入的本地模块）、输入文件内容和配置
+（CONFIG_VARIABLES 中影响输出的环境变量；AQI_TRACE 等诊断开关不计入）的哈希组成，指纹未变化且输出存在时跳过该阶段；
+互不依赖的阶段（数据分析与模型训练）并行执行。
+
+用法:
+    python pipeline.py                 # 运行有变化的阶段
+    python pipeline.py --force 数据采集  # 强制重跑指定阶段（例如每晚重新采集）
+    python pipeline.py --dry-run       # 只显示哪些阶段需要运行
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATE_DIR = os.path.join(ROOT, '.pipeline')
+STATE_PATH = os.path.join(STATE_DIR, 'state.json')
+HASH_CACHE_PATH = os.path.join(STATE_DIR, 'hash_cache.json')
+# 会改变阶段输出的环境变量
+CONFIG_VARIABLES = ('AQI_RESOLUTION', 'AQI_SOURCE')
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+    deps: list = field(default_factory=list)
+
+
+STAGES = [
+    Stage('数据采集', '1.数据采集.py', inputs=['station_dumps/*'], outputs=['空气质量-*_*.csv']),
+    Stage('数据处理', '2.数据处理.py', inputs=['空气质量-*_*.csv'],
+          outputs=['dataset.csv', 'quarantine.csv', 'data_quality_report.csv', 'quality_statistics.json'],
+          deps=['数据采集']),
+    Stage('数据分析', '3.数据分析.py', inputs=['dataset.csv'], outputs=['analysis_plots/*.png'],
+          deps=['数据处理']),
+    Stage('开始训练', '4.开始训练.py', inputs=['dataset.csv'], outputs=['models/*.pkl', 'evaluation/*.csv'],
+          deps=['数据处理']),
+]
+
+
+class FileHasher:
+    """按 (大小, 修改时间) 缓存文件哈希，未修改的大文件不会重复读取"""
+
+    def __init__(self, cache_path=HASH_CACHE_PATH):
+        self.cache_path = cache_path
+        self.cache = {}
+        if os.path.exists(cache_path):
+            with open(cache_path, encoding='utf-8') as f:
+                self.cache = json.load(f)
+
+    def hash(self, path):
+        stat = os.stat(path)
+        key = os.path.relpath(path, ROOT)
+        cached = self.cache.get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['sha256']
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.cache[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+        return self.cache[key]['sha256']
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, ensure_ascii=False, indent=1)
+
+
+def _expand(patterns):
+    paths = []
+    for pattern in patterns:
+        paths.extend(glob.glob(os.path.join(ROOT, pattern)))
+    return sorted(p for p in paths if os.path.isfile(p))
+
+
+def code_files(script):
+    """脚本及其递归导入的本地模块"""
+    found, pending = [], [script]
+    while pending:
+        name = pending.pop()
+        path = os.path.join(ROOT, name)
+        if name in found or not os.path.exists(path):
+            continue
+        found.append(name)
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+        for module in re.findall(r'^\s*(?:from|import)\s+(\w+)', source, flags=re.MULTILINE):
+            pending.append(f'{module}.py')
+    return sorted(found)
+
+
+def fingerprint(stage, hasher):
+    digest = hashlib.sha256(stage.name.encode('utf-8'))
+    for path in code_files(stage.script):
+        digest.update(f'code:{path}:{hasher.hash(os.path.join(ROOT, path))}'.encode('utf-8'))
+    for path in _expand(stage.inputs):
+        digest.update(f'input:{os.path.relpath(path, ROOT)}:{hasher.hash(path)}'.encode('utf-8'))
+    config = [(k, os.environ.get(k)) for k in CONFIG_VARIABLES]
+    digest.update(json.dumps(config, ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def outputs_exist(stage):
+    return all(glob.glob(os.path.join(ROOT, pattern)) for pattern in stage.outputs)
+
+
+def run_stage(stage):
+    """在子进程中运行阶段脚本，输出写入 .pipeline/logs/{阶段}.log"""
+    log_dir = os.path.join(STATE_DIR, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    env = dict(os.environ, MPLBACKEND='Agg', PYTHONIOENCODING='utf-8')
+    start = time.perf_counter()
+    with open(os.path.join(log_dir, f'{stage.name}.log'), 'w', encoding='utf-8') as log:
+        result = subprocess.run([sys.executable, stage.script], cwd=ROOT, env=env,
+                                stdout=log, stderr=subprocess.STDOUT)
+    return result.returncode, time.perf_counter() - start
+
+
+def load_state():
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(STATE_PATH, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+
+
+def run_pipeline(stages=STAGES, force=(), jobs=None, dry_run=False):
+    """按依赖顺序运行各阶段，返回 {阶段: 状态}"""
+    state = load_state()
+    hasher = FileHasher()
+    status = {}
+    by_name = {stage.name: stage for stage in stages}
+    pending = dict(by_name)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs or len(stages)) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                dep_status = [status.get(dep) for dep in stage.deps if dep in by_name]
+                if None in dep_status:
+                    continue
+                del pending[name]
+                if any(s in ('失败', '已取消') for s in dep_status):
+                    status[name] = '已取消'
+                    print(f"⏭️ {name}: 上游阶段失败，已取消")
+                    continue
+
+                fp = fingerprint(stage, hasher)
+                unchanged = state.get(name, {}).get('fingerprint') == fp and outputs_exist(stage)
+                # 试运行时上游尚未真正执行，下游输入可能变化
+                if dry_run and '待运行' in dep_status:
+                    unchanged = False
+                if unchanged and name not in force:
+                    status[name] = '已跳过'
+                    print(f"✅ {name}: 指纹未变化，跳过")
+                elif dry_run:
+                    status[name] = '待运行'
+                    print(f"▶️ {name}: 需要运行")
+                else:
+                    print(f"▶️ {name}: 开始运行")
+                    running[pool.submit(run_stage, stage)] = (name, fp)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, _ = running.pop(future)
+                returncode, elapsed = future.result()
+                if returncode == 0:
+                    # 阶段运行后输入可能已被更新，重新计算指纹
+                    state[name] = {'fingerprint': fingerprint(by_name[name], hasher), 'finished_at': time.time()}
+                    status[name] = '已完成'
+                    print(f"✅ {name}: 完成，用时 {elapsed:.1f} 秒")
+                else:
+                    state.pop(name, None)
+                    status[name] = '失败'
+                    print(f"❌ {name}: 失败（退出码 {returncode}），日志见 .pipeline/logs/{name}.log")
+            save_state(state)
+
+    hasher.save()
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="空气质量预测流水线")
+    parser.add_argument('--force', nargs='*', default=[], help="强制重跑的阶段名称")
+    parser.add_argument('--jobs', type=int, default=None, help="最大并行阶段数")
+    parser.add_argument('--dry-run', action='store_true', help="只显示需要运行的阶段")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    status = run_pipeline(force=set(args.force), jobs=args.jobs, dry_run=args.dry_run)
+    print(f"\n流水线结束，用时 {time.perf_counter() - start:.1f} 秒")
+    sys.exit(1 if '失败' in status.values() else 0)
@@ -0,0 +1,279 @@
+# prediction_log.py
+"""
+追加写入的列式预测日志
+
+- append() 只把记录放入队列，由后台线程攒批后写成一个列式分段文件（npz，每列一个数组），
+  不阻塞界面线程；
+- index.json 记录每个分段的行数、各时间列的最小/最大值和包含的模型、城市，
+  按时间范围、模型和城市查询时先用索引跳过无关分段；
+- 小分段数量达到阈值时在后台合并为一个大分段（合并后的索引原子替换，再删除旧文件）；
+- 写入失败（磁盘已满、没有权限等）时打印错误并丢弃该批记录，写入线程继续运行，
+  flush()/close() 最多等待 timeout 秒，不会让界面卡住。
+同一日志目录只应由一个进程写入，可由任意多个进程读取。
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_spec import CITY_COLUMN
+
+LOG_DIR = 'prediction_log'
+INDEX_FILE = 'index.json'
+TIME_COLUMNS = ('时间', '目标时间')
+MODEL_COLUMN = '模型'
+
+
+def model_version(model_path):
+    """模型版本：模型文件的修改时间"""
+    return time.strftime('%Y%m%d%H%M%S', time.localtime(os.path.getmtime(model_path)))
+
+
+def _to_columns(records):
+    """记录列表或 DataFrame → {列名: numpy 数组}，时间列存为 int64 纳秒，文本列存为定长字符串"""
+    frame = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(records)
+    columns = {}
+    for name in frame.columns:
+        values = frame[name]
+        if name in TIME_COLUMNS:
+            columns[name] = pd.to_datetime(values).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        elif pd.api.types.is_numeric_dtype(values):
+            columns[name] = values.to_numpy(dtype=np.float64)
+        else:
+            columns[name] = values.fillna('').astype(str).to_numpy(dtype=str)
+    return columns
+
+
+def _segment_meta(file_name, columns):
+    meta = {'file': file_name, 'rows': len(next(iter(columns.values()))), 'min': {}, 'max': {}}
+    for name in TIME_COLUMNS:
+        if name in columns:
+            valid = columns[name][columns[name] != np.iinfo(np.int64).min]  # 去掉 NaT
+            if len(valid):
+                meta['min'][name], meta['max'][name] = int(valid.min()), int(valid.max())
+    meta['models'] = sorted(set(columns[MODEL_COLUMN].tolist())) if MODEL_COLUMN in columns else []
+    meta['cities'] = sorted(set(columns[CITY_COLUMN].tolist())) if CITY_COLUMN in columns else []
+    return meta
+
+
+class PredictionLog:
+    """
+    预测日志
+
+    参数:
+        directory: 日志目录
+        batch_size: 缓冲多少条记录后写一个分段
+        flush_interval: 缓冲中最早的记录最多等待的秒数
+        compact_segments: 小分段数量达到该值时合并
+        compact_rows: 行数少于该值的分段视为小分段
+    """
+
+    def __init__(self, directory=LOG_DIR, batch_size=256, flush_interval=5.0,
+                 compact_segments=16, compact_rows=50_000):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compact_segments = compact_segments
+        self.compact_rows = compact_rows
+        self._queue = queue.Queue()
+        self._index_lock = threading.Lock()
+        self._thread = None
+        self.last_error = None
+
+    # ---------- 写入 ----------
+
+    def append(self, record):
+        """追加一条记录（dict），缺少 时间 时使用当前时间；立即返回"""
+        if '时间' not in record:
+            record = dict(record, 时间=pd.Timestamp.now())
+        if self._thread is None:
+            self._start()
+        self._queue.put(('record', record))
+
+    def flush(self, timeout=10.0):
+        """等待缓冲中的记录全部写入分段，超时返回 False"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """写入剩余记录并停止后台线程，超时返回 False"""
+        if self._thread is None:
+            return True
+        finished = True
+        if self._thread.is_alive():
+            done = threading.Event()
+            self._queue.put(('stop', done))
+            finished = done.wait(timeout)
+        self._thread = None
+        return finished
+
+    def _start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='prediction-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        buffer = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                kind, item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind, item = 'flush', None
+
+            if kind == 'record':
+                buffer.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(buffer) < self.batch_size:
+                    continue
+
+            try:
+                if buffer:
+                    self._write_buffer(buffer)
+            finally:
+                # 无论写入是否成功都清空缓冲并唤醒等待者
+                buffer, deadline = [], None
+                if kind in ('flush', 'stop') and item is not None:
+                    item.set()
+            if kind == 'stop':
+                return
+
+    def _write_buffer(self, buffer):
+        try:
+            meta = self._write_segment(_to_columns(buffer))
+            with self._index_lock:
+                index = self._load_index()
+                index['segments'].append(meta)
+                self._save_index(index)
+        except Exception as e:
+            self.last_error = e
+            print(f"[预测日志] 写入失败，丢弃 {len(buffer)} 条记录: {e}")
+            return
+        try:
+            self._maybe_compact()
+        except Exception as e:
+            # 合并失败不影响已写入的分段，下次写入后重试
+            self.last_error = e
+            print(f"[预测日志] 合并分段失败: {e}")
+
+    def _write_segment(self, columns):
+        """写入一个分段文件，返回其索引条目"""
+        file_name = f'seg-{time.time_ns()}-{os.getpid()}.npz'
+        path = os.path.join(self.directory, file_name)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **columns)
+        os.replace(path + '.tmp', path)
+        return _segment_meta(file_name, columns)
+
+    def _maybe_compact(self):
+        index = self._load_index()
+        small = [seg for seg in index['segments'] if seg['rows'] < self.compact_rows]
+        if len(small) >= self.compact_segments:
+            self.compact(small)
+
+    def compact(self, segments=None):
+        """把多个分段按时间排序合并为一个分段（写入线程运行期间只由该线程调用）"""
+        index = self._load_index()
+        segments = index['segments'] if segments is None else segments
+        if len(segments) < 2:
+            return
+        frame = self._read_segments(segments).sort_values('时间', kind='stable')
+        meta = self._write_segment(_to_columns(frame))
+
+        merged = {seg['file'] for seg in segments}
+        with self._index_lock:
+            index = self._load_index()
+            index['segments'] = [seg for seg in index['segments'] if seg['file'] not in merged]
+            index['segments'].append(meta)
+            self._save_index(index)
+        for name in merged:
+            os.remove(os.path.join(self.directory, name))
+
+    # ---------- 索引 ----------
+
+    def _load_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        return {'segments': []}
+
+    def _save_index(self, index):
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    # ---------- 查询 ----------
+
+    def _read_segments(self, segments, columns=None):
+        frames = []
+        for seg in segments:
+            with np.load(os.path.join(self.directory, seg['file'])) as data:
+                names = [name for name in (columns or data.files) if name in data.files]
+                frames.append(pd.DataFrame({name: data[name] for name in names}))
+        frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        for name in TIME_COLUMNS:
+            if name in frame.columns:
+                frame[name] = pd.to_datetime(frame[name])
+        return frame
+
+    def query(self, start=None, end=None, model=None, time_column='时间', columns=None, city=None):
+        """
+        查询 [start, end] 时间范围内（按 time_column）、指定模型和城市的记录
+
+        只读取索引中时间范围、模型和城市与条件相交的分段（旧索引中没有城市信息的分段照常读取）；
+        本进程尚在缓冲中的记录需先 flush()。
+        """
+        start_ns = pd.Timestamp(start).value if start is not None else None
+        end_ns = pd.Timestamp(end).value if end is not None else None
+        if columns is not None:
+            columns = list(dict.fromkeys(list(columns) + [time_column, MODEL_COLUMN]
+                                         + ([CITY_COLUMN] if city is not None else [])))
+
+        for attempt in range(2):
+            segments = []
+            for seg in self._load_index()['segments']:
+                if time_column not in seg['min']:
+                    continue
+                if start_ns is not None and seg['max'][time_column] < start_ns:
+                    continue
+                if end_ns is not None and seg['min'][time_column] > end_ns:
+                    continue
+                if model is not None and model not in seg['models']:
+                    continue
+                if city is not None and 'cities' in seg and city not in seg['cities']:
+                    continue
+                segments.append(seg)
+            try:
+                frame = self._read_segments(segments, columns)
+                break
+            except FileNotFoundError:
+                # 读取期间分段被合并，重新读取索引
+                if attempt:
+                    raise
+
+        if frame.empty:
+            return frame
+        mask = np.ones(len(frame), dtype=bool)
+        if start is not None:
+            mask &= (frame[time_column] >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (frame[time_column] <= pd.Timestamp(end)).to_numpy()
+        if model is not None:
+            mask &= (frame[MODEL_COLUMN] == model).to_numpy()
+        if city is not None:
+            mask &= (frame[CITY_COLUMN] == city).to_numpy() if CITY_COLUMN in frame.columns else False
+        return frame[mask].reset_index(drop=True)
@@ -0,0 +1,178 @@
+# report_plots.py
+"""
+分析与评估报告中的各个图表
+
+每个函数只接收绘图所需的数据和输出路径，由 report_renderer 在子进程中调用。
+"""
+
+import matplotlib
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+import pandas as pd
+import seaborn as sns
+
+# 依次尝试的中文字体（Windows 微软雅黑 / 黑体）
+FONT_FAMILIES = ['Microsoft YaHei', 'SimHei', 'DejaVu Sans']
+
+
+def setup_matplotlib():
+    """使用无界面的 Agg 后端并设置中文字体"""
+    matplotlib.use('Agg')
+    plt.rcParams['font.sans-serif'] = FONT_FAMILIES
+    plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+
+
+# ---------- 数据分析 ----------
+
+def time_series_aqi(series_by_city, out_path):
+    """AQI指数随时间变化，series_by_city 为 {城市: 含 日期、AQI指数 两列的降采样 DataFrame}"""
+    plt.figure(figsize=(14, 7))
+    for city, series in series_by_city.items():
+        label = 'AQI指数' if len(series_by_city) == 1 else f'{city} AQI指数'
+        plt.plot(series['日期'], series['AQI指数'], label=label)
+    plt.xlabel('日期')
+    plt.ylabel('AQI指数')
+    plt.title('AQI指数随时间变化')
+    plt.legend()
+    ax = plt.gca()
+    ax.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close()
+
+
+def monthly_boxplot(box_stats, out_path):
+    """AQI指数的月度分布，box_stats 为预先计算好的各月箱线图统计量"""
+    plt.figure(figsize=(14, 7))
+    plt.gca().bxp(box_stats, showfliers=True)
+    plt.xlabel('月份')
+    plt.ylabel('AQI指数')
+    plt.title('AQI指数的月度分布')
+    plt.savefig(out_path)
+    plt.close()
+
+
+def correlation_heatmap(correlation_matrix, out_path):
+    """特征相关性热力图"""
+    plt.figure(figsize=(14, 7))
+    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm')
+    plt.title('特征相关性热力图')
+    plt.savefig(out_path)
+    plt.close()
+
+
+# ---------- 模型评估 ----------
+
+def metrics_comparison(results_df, out_path):
+    """性能指标比较图"""
+    plt.figure(figsize=(14, 10))
+
+    # 创建子图
+    metrics = ['MAE', 'RMSE', 'R2', '准确率(±30)']
+    titles = ['平均绝对误差(MAE)', '均方根误差(RMSE)', '决定系数(R²)', '准确率(误差≤30)']
+
+    for i, metric in enumerate(metrics):
+        ax = plt.subplot(2, 2, i + 1)
+        # 使用条形图而不是barplot
+        x = range(len(results_df))
+        values = results_df[metric]
+
+        # 跳过无效值
+        valid_mask = values.notna()
+        valid_df = results_df[valid_mask]
+        valid_values = valid_df[metric]
+
+        if len(valid_values) > 0:
+            bars = ax.bar(x, values, color=plt.cm.tab10.colors[:len(values)])
+
+            # 添加数值标签
+            for bar in bars:
+                height = bar.get_height()
+                if not pd.isna(height):
+                    ax.text(bar.get_x() + bar.get_width() / 2., height,
+                            f'{height:.2f}' if metric != 'R2' else f'{height:.4f}',
+                            ha='center', va='bottom')
+
+            # 设置x轴标签
+            ax.set_xticks(x)
+            ax.set_xticklabels(results_df['模型'], rotation=45)
+            ax.set_title(titles[i])
+            ax.grid(True, linestyle='--', alpha=0.7)
+
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close()
+
+
+def cv_comparison(results_df, out_path):
+    """交叉验证结果比较图"""
+    plt.figure(figsize=(10, 6))
+
+    # 筛选有效数据
+    valid_mask = results_df['交叉验证RMSE均值'].notna() & results_df['交叉验证RMSE标准差'].notna()
+    valid_df = results_df[valid_mask]
+
+    x = range(len(valid_df))
+    means = valid_df['交叉验证RMSE均值']
+    stds = valid_df['交叉验证RMSE标准差']
+
+    # 使用条形图而不是barplot
+    bars = plt.bar(x, means, yerr=stds, capsize=5, color=plt.cm.tab10.colors[:len(means)])
+
+    # 添加数值标签
+    for bar, mean, std in zip(bars, means, stds):
+        plt.text(bar.get_x() + bar.get_width() / 2., mean + std + 0.5,
+                 f'{mean:.2f}±{std:.2f}', ha='center', va='bottom')
+
+    plt.xticks(x, valid_df['模型'], rotation=45)
+    plt.title('交叉验证RMSE比较（均值和标准差）')
+    plt.ylabel('RMSE')
+    plt.grid(True, linestyle='--', alpha=0.7)
+
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close()
+
+
+def error_distributions(errors_by_model, out_path):
+    """误差分布图，errors_by_model 为 {模型名称: 误差 Series}"""
+    plt.figure(figsize=(14, 10))
+
+    for i, (name, errors) in enumerate(errors_by_model.items()):
+        ax = plt.subplot(2, 3, i + 1)
+        errors = errors.dropna()
+
+        if len(errors) > 0:
+            # 绘制直方图和KDE曲线
+            sns.histplot(errors, bins=30, kde=True, color=plt.cm.tab10(i))
+
+            # 添加统计信息
+            mean_err = errors.mean()
+            std_err = errors.std()
+            ax.axvline(mean_err, color='r', linestyle='--')
+            ax.text(0.95, 0.95, f'均值: {mean_err:.2f}\n标准差: {std_err:.2f}',
+                    transform=ax.transAxes, ha='right', va='top',
+                    bbox=dict(facecolor='white', alpha=0.8))
+
+            ax.set_title(f'{name}模型预测误差分布')
+            ax.set_xlabel('误差（预测值 - 真实值）')
+            ax.set_ylabel('频率')
+            ax.grid(True, linestyle='--', alpha=0.5)
+
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close()
+
+
+def feature_importance(importance_df, out_path):
+    """各模型的全局特征重要性（平均绝对贡献）"""
+    ordered = importance_df.loc[importance_df.mean(axis=1).sort_values().index]
+    ax = ordered.plot.barh(figsize=(12, 8), width=0.8)
+    ax.set_title('全局特征重要性（平均绝对贡献）')
+    ax.set_xlabel('平均绝对贡献（AQI）')
+    ax.grid(True, linestyle='--', alpha=0.7)
+
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close()
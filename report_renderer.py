@@ -0,0 +1,101 @@
+# report_renderer.py
+"""
+并行、带缓存的图表渲染
+
+每个图表是一个 FigureJob(绘图函数, 数据, 输出路径)。渲染前对 绘图函数源码 + 数据
+计算哈希，与输出目录下 .render_cache.json 中的记录一致且图片存在时跳过；
+其余图表分发到进程池中用 Agg 后端并行渲染。绘图函数必须定义在可导入的模块中
+（见 report_plots.py）。
+"""
+
+import inspect
+import json
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import joblib
+
+import report_plots
+
+FigureJob = namedtuple('FigureJob', ['func', 'data', 'out_path'])
+
+CACHE_FILE = '.render_cache.json'
+
+
+def job_key(job):
+    """绘图函数源码与输入数据的联合哈希"""
+    source = inspect.getsource(job.func)
+    return joblib.hash((job.func.__module__, job.func.__qualname__, source, job.data))
+
+
+def _load_manifest(directory):
+    path = os.path.join(directory, CACHE_FILE)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def _save_manifest(directory, manifest):
+    with open(os.path.join(directory, CACHE_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+
+def _render(job):
+    job.func(job.data, job.out_path)
+    return job.out_path
+
+
+@contextmanager
+def _without_main_path():
+    """
+    spawn 方式启动的子进程会重新执行 __main__ 脚本；编号脚本没有 main 保护，
+    创建进程期间临时隐藏 __main__.__file__，子进程只需导入 report_plots。
+    """
+    main = sys.modules['__main__']
+    main_file = main.__dict__.pop('__file__', None)
+    try:
+        yield
+    finally:
+        if main_file is not None:
+            main.__file__ = main_file
+
+
+def render_figures(jobs, max_workers=None):
+    """渲染所有图表，返回 (已渲染列表, 已跳过列表)"""
+    manifests = {}
+    pending, skipped = [], []
+    for job in jobs:
+        directory = os.path.dirname(job.out_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        manifest = manifests.setdefault(directory, _load_manifest(directory))
+        key = job_key(job)
+        name = os.path.basename(job.out_path)
+        if manifest.get(name) == key and os.path.exists(job.out_path):
+            skipped.append(job.out_path)
+            continue
+        pending.append((job, directory, name, key))
+
+    rendered = []
+    if len(pending) == 1:
+        report_plots.setup_matplotlib()
+        rendered.append(_render(pending[0][0]))
+    elif pending:
+        workers = min(max_workers or os.cpu_count() or 1, len(pending))
+        with _without_main_path(), ProcessPoolExecutor(max_workers=workers,
+                                                       initializer=report_plots.setup_matplotlib) as pool:
+            rendered.extend(pool.map(_render, [job for job, _, _, _ in pending]))
+
+    for job, directory, name, key in pending:
+        manifests[directory][name] = key
+    for directory, manifest in manifests.items():
+        _save_manifest(directory, manifest)
+
+    for path in rendered:
+        print(f"✅ 图表已保存: {path}")
+    for path in skipped:
+        print(f"⏭️ 数据未变化，跳过图表: {path}")
+    return rendered, skipped
@@ -0,0 +1,101 @@
+# timeseries_features.py
+"""
+与时间分辨率无关的时间序列处理
+
+通过环境变量 AQI_RESOLUTION 选择 'day'（默认，逐日）或 'hour'（逐小时）。
+- 滞后特征按时间单位定义：'AQI_1天前' 是 24 小时前的值，'AQI_1小时前' 是 1 小时前的值，
+  按 (城市, 时间) 对齐合并，数据缺失的时刻得到缺失值而不是错位的上一行；
+- 逐小时站点数据可从本地 CSV/JSON 导出文件读取，并按城市取各站点均值；
+- 逐日数据可由逐小时数据向量化重采样汇总得到；
+- 数值列使用 float32、城市列使用 category，以便在内存中容纳多城市的逐小时历史。
+"""
+
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+# 分辨率、列名与特征名定义在不依赖 pandas 的 feature_spec 中，这里一并导出
+from feature_spec import (RESOLUTION, RESOLUTIONS, POLLUTANTS, LAGS, TIME_COLUMN, CITY_COLUMN,
+                          STATION_COLUMN, resolution_config, lag_name, feature_columns, raw_file_pattern)
+
+
+def downcast(data):
+    """数值列转为 float32，城市/站点列转为 category"""
+    for column in data.columns:
+        if column in (CITY_COLUMN, STATION_COLUMN):
+            data[column] = data[column].astype('category')
+        elif pd.api.types.is_float_dtype(data[column]) or pd.api.types.is_integer_dtype(data[column]):
+            data[column] = data[column].astype(np.float32)
+    return data
+
+
+def build_lag_features(data, resolution=RESOLUTION, lags=LAGS):
+    """按时间单位为每个城市生成滞后特征"""
+    freq = resolution_config(resolution)['freq']
+    value_columns = [column for column, _ in POLLUTANTS if column in data.columns]
+    keys = [CITY_COLUMN, TIME_COLUMN] if CITY_COLUMN in data.columns else [TIME_COLUMN]
+    # 时间戳对齐到分辨率，便于精确匹配
+    data[TIME_COLUMN] = data[TIME_COLUMN].dt.floor(freq)
+    base = data[keys + value_columns].drop_duplicates(keys, keep='last')
+
+    for n in lags:
+        lagged = base.copy()
+        lagged[TIME_COLUMN] = lagged[TIME_COLUMN] + pd.Timedelta(n, unit=freq)
+        names = {column: lag_name(prefix, n, resolution) for column, prefix in POLLUTANTS if column in value_columns}
+        data = data.merge(lagged.rename(columns=names), on=keys, how='left')
+    return data
+
+
+def rollup_daily(hourly):
+    """
+    逐小时数据按 (城市, 日) 汇总为逐日均值
+
+    日 AQI 不取逐小时 AQI 的均值，而是按 HJ 633 由逐日平均浓度和日均值分段重新计算，
+    与数据质量检查中的 AQI 一致性规则使用同一口径。
+    """
+    from data_quality import recompute_aqi  # data_quality 依赖本模块，在函数内导入
+
+    value_columns = [column for column, _ in POLLUTANTS if column in hourly.columns]
+    keys = [CITY_COLUMN] if CITY_COLUMN in hourly.columns else []
+    daily = (hourly.groupby(keys + [pd.Grouper(key=TIME_COLUMN, freq='D')], observed=True)[value_columns]
+             .mean()
+             .reset_index())
+    daily['AQI指数'] = np.round(recompute_aqi(daily, 'day'))
+    return downcast(daily)
+
+
+def _read_dump(path):
+    if path.endswith('.json') or path.endswith('.jsonl'):
+        return pd.read_json(path, lines=path.endswith('.jsonl'))
+    return pd.read_csv(path)
+
+
+def load_station_dumps(dump_dir='station_dumps'):
+    """
+    读取本地逐小时站点导出文件（CSV/JSON/JSONL），按 (城市, 小时) 取各站点均值
+
+    文件需包含 时间（或 日期）、城市 和各污染物列，站点 列可选。
+    """
+    paths = sorted(glob.glob(os.path.join(dump_dir, '*.csv')) +
+                   glob.glob(os.path.join(dump_dir, '*.json')) +
+                   glob.glob(os.path.join(dump_dir, '*.jsonl')))
+    if not paths:
+        raise FileNotFoundError(f"目录 {dump_dir} 中没有站点数据文件")
+
+    frames = []
+    for path in paths:
+        frame = _read_dump(path).rename(columns={'时间': TIME_COLUMN})
+        value_columns = [column for column, _ in POLLUTANTS if column in frame.columns]
+        frame = frame[[TIME_COLUMN, CITY_COLUMN] + value_columns]
+        frame[TIME_COLUMN] = pd.to_datetime(frame[TIME_COLUMN]).dt.floor('h')
+        frames.append(downcast(frame))
+
+    hourly = pd.concat(frames, ignore_index=True)
+    hourly[CITY_COLUMN] = hourly[CITY_COLUMN].astype(str)
+    hourly = (hourly.groupby([CITY_COLUMN, TIME_COLUMN])
+              .mean()
+              .reset_index()
+              .sort_values([CITY_COLUMN, TIME_COLUMN], ignore_index=True))
+    return downcast(hourly)